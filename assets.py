@@ -0,0 +1,150 @@
+"""
+assets.py
+
+Surface cache for the images and pre-rendered keyboards used by every screen.
+
+Surfaces are stored already decoded, scaled and converted to the display format, so returning to a
+screen is a dictionary lookup instead of a JPEG decode. The cache has a memory budget in bytes, which
+grows with the window (see budget_for), and evicts the least recently used surfaces once it is over budget.
+
+ImageLoader fills the cache from a background thread: images are decoded and scaled off the render loop,
+and only the final convert() (which needs the display) happens on the main thread when they are collected.
+"""
+from collections import OrderedDict, deque
+import pygame
+import threading
+
+DEFAULT_BUDGET = 48 * 1024 * 1024  # bytes of pixel data kept alive, at least, whatever the window size
+SCREENS_KEPT = 6  # full windows' worth of 32-bit pixels the budget holds at large window sizes
+
+
+class SurfaceCache:
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        self.used = 0
+        self.surfaces = OrderedDict()  # key -> surface, least recently used first
+        self.misses = 0  # surfaces built, for the surface counts in the performance metrics
+
+    def get(self, key, build):
+        """
+        Given:
+            key: any hashable name for the surface
+            build: function with no arguments that creates the surface on a miss
+        Output:
+            The cached surface
+        """
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = build()
+        self.surfaces[key] = surface
+        self.used += surface_bytes(surface)
+        self.evict()
+        return surface
+
+    def find(self, key):
+        """
+        The cached surface, or None, without counting a miss
+        """
+        return self.surfaces.get(key)
+
+    def add(self, key, surface):
+        self.get(key, lambda: surface)
+
+    def image(self, path, size):
+        """
+        Loads an image file scaled to size (width, height) and converted for fast blitting
+        """
+        def load():
+            return pygame.transform.scale(convert(pygame.image.load(path)), size)
+        return self.get((path, size), load)
+
+    def set_budget(self, budget):
+        self.budget = budget
+        self.evict()
+
+    def evict(self):
+        """
+        Drops least recently used surfaces until the cache fits its budget (the newest one always stays)
+        """
+        while self.used > self.budget and len(self.surfaces) > 1:
+            key, surface = self.surfaces.popitem(last=False)
+            self.used -= surface_bytes(surface)
+
+
+def budget_for(size):
+    """
+    Output:
+        Budget in bytes for a window size (width, height): SCREENS_KEPT windows of pixels, at least DEFAULT_BUDGET
+    """
+    width, height = size
+    return max(DEFAULT_BUDGET, SCREENS_KEPT * width * height * 4)
+
+
+def surface_bytes(surface):
+    return surface.get_pitch() * surface.get_height()
+
+
+def convert(surface):
+    """
+    Converts a decoded image to the display format, keeping its transparency if it has any
+    """
+    if surface.get_flags() & pygame.SRCALPHA:
+        return surface.convert_alpha()
+    return surface.convert()
+
+
+class ImageLoader:
+    """
+    Background thread that decodes and scales images for a SurfaceCache
+    """
+    def __init__(self, cache):
+        self.cache = cache
+        self.wanted = deque()  # (path, size) still to decode, most wanted first
+        self.decoded = deque()  # (path, size, surface or None if it failed) waiting for collect()
+        self.failed = set()  # images that could not be decoded, never asked for again
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.work, name="image-loader", daemon=True)
+        self.thread.start()
+
+    def request(self, images):
+        """
+        Replaces whatever is still waiting to be decoded with images, (path, size) pairs, most wanted first;
+        images already cached are skipped
+        """
+        with self.condition:
+            self.wanted = deque(image for image in images
+                                if image not in self.failed and self.cache.find(image) is None)
+            self.condition.notify()
+
+    def work(self):
+        while True:
+            with self.condition:
+                while not self.wanted:
+                    self.condition.wait()
+                path, size = self.wanted.popleft()
+            try:
+                surface = pygame.transform.scale(pygame.image.load(path), size)
+            except (pygame.error, OSError) as error:  # a missing or broken image leaves its placeholder up
+                print("could not load %s: %s" % (path, error))
+                surface = None
+            self.decoded.append((path, size, surface))
+
+    def collect(self):
+        """
+        Converts every image decoded since the last call and adds it to the cache (main thread only)
+
+        Output:
+            List of the (path, size) keys that were added
+        """
+        added = []
+        while self.decoded:
+            path, size, surface = self.decoded.popleft()
+            if surface is None:
+                self.failed.add((path, size))
+            elif self.cache.find((path, size)) is None:
+                self.cache.add((path, size), convert(surface))
+                added.append((path, size))
+        return added
@@ -0,0 +1,198 @@
+"""
+audio.py
+
+Offline song audio and a playback position the visualizer can lock onto.
+
+Instead of handing the .mid file to whatever MIDI synth SDL_mixer was built with, each song is rendered to
+PCM once, with the built-in NumPy synth (synth.render_song) or, when SOUNDFONT names a .sf2 file and the
+fluidsynth program is installed, with that soundfont. The result is cached as a WAV file keyed by the MIDI
+file's content hash, the synth version and the sample rate, so a song is only rendered the first time. The
+cache is kept under AUDIO_CACHE_BUDGET bytes by deleting the songs played least recently.
+
+A song played before it is in the cache (library.py --audio renders every song up front) is rendered by a
+BackgroundRender in a separate process, so the synth neither blocks the scene nor competes with the render
+loop for the interpreter.
+
+SongAudio plays the WAV through pygame.mixer.music and reports the position from the mixer's own count of
+samples played, so the scheduler follows the audio instead of a clock that merely started at the same time.
+"""
+import hashlib
+import multiprocessing
+import numpy as np
+import os
+import pygame
+import shutil
+import subprocess
+import synth
+import tempfile
+import timeline
+import wave
+
+SYNTH_VERSION = 1  # Bump whenever synth.render_song's output changes so old cache entries are ignored
+AUDIO_CACHE_DIRECTORY = '.audio_cache'
+AUDIO_CACHE_BUDGET = 512 * 1024 * 1024  # bytes of WAV files kept; a mono 16-bit song takes about 5 MB a minute
+SOUNDFONT = os.environ.get('SOUNDFONT')  # optional .sf2 file rendered with the fluidsynth command line program
+WRITE_CHUNK = 1 << 20  # samples converted to 16-bit at a time, so the WAV is written without a full-length copy
+
+renders = {}  # cache path -> BackgroundRender still running, so re-entering a song does not render it twice
+
+
+def audio_key(contents, sample_rate):
+    digest = hashlib.sha1()
+    digest.update(("%d %d %s" % (SYNTH_VERSION, sample_rate, SOUNDFONT)).encode())
+    digest.update(contents)
+    return digest.hexdigest()
+
+
+def soundfont_available():
+    return SOUNDFONT is not None and os.path.exists(SOUNDFONT) and shutil.which('fluidsynth') is not None
+
+
+def cache_path(midi_file, sample_rate=synth.SAMPLE_RATE):
+    """
+    Output:
+        Path the song's WAV file has in the audio cache, whether it was rendered yet or not
+    """
+    with open(midi_file, 'rb') as song_file:
+        return os.path.join(AUDIO_CACHE_DIRECTORY, audio_key(song_file.read(), sample_rate) + '.wav')
+
+
+def render_audio(midi_file, sample_rate=synth.SAMPLE_RATE):
+    """
+    Given:
+        midi_file: path to a .mid file
+    Output:
+        Path of the song's cached WAV file, rendered first if it is not in the cache yet
+    """
+    path = cache_path(midi_file, sample_rate)
+    if os.path.exists(path):
+        os.utime(path)  # The modification time records when the song was last played, for prune_cache
+        return path
+    os.makedirs(AUDIO_CACHE_DIRECTORY, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(suffix='.tmp', dir=AUDIO_CACHE_DIRECTORY)  # this process's own
+    os.close(handle)
+    try:
+        if soundfont_available():
+            subprocess.run(['fluidsynth', '-ni', '-q', '-r', str(sample_rate), '-T', 'wav', '-F', temporary, SOUNDFONT,
+                            midi_file], check=True, stdout=subprocess.DEVNULL)
+        else:
+            song = timeline.load_timeline(midi_file)
+            write_wav(temporary, synth.render_song(song.notes, song.length, sample_rate), sample_rate)
+        os.replace(temporary, path)  # Renamed into place last, so a half-written file is never played
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    prune_cache(keep=path)
+    return path
+
+
+def write_wav(path, samples, sample_rate):
+    """
+    Writes mono float samples in [-1, 1] as a 16-bit mono WAV file, WRITE_CHUNK samples at a time
+    """
+    with wave.open(path, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        for start in range(0, len(samples), WRITE_CHUNK):
+            chunk = np.clip(samples[start:start + WRITE_CHUNK], -1.0, 1.0)
+            chunk *= synth.VOLUME * 32767
+            wav_file.writeframes(chunk.astype(np.int16).tobytes())
+
+
+def prune_cache(keep=None, budget=AUDIO_CACHE_BUDGET):
+    """
+    Deletes the least recently played WAV files until the cache holds at most budget bytes (never keep)
+    """
+    entries = []
+    for name in os.listdir(AUDIO_CACHE_DIRECTORY):
+        if name.endswith('.wav'):
+            path = os.path.join(AUDIO_CACHE_DIRECTORY, name)
+            status = os.stat(path)
+            entries.append((status.st_mtime, status.st_size, path))
+    total = sum(size for played, size, path in entries)
+    for played, size, path in sorted(entries):
+        if total <= budget:
+            break
+        if path != keep:
+            os.remove(path)
+            total -= size
+
+
+class BackgroundRender:
+    """
+    Renders a song into the audio cache in a separate process. The process is a daemon, so quitting during the
+    render just leaves the song to be rendered the next time it is played.
+    """
+    def __init__(self, midi_file, sample_rate):
+        self.midi_file = midi_file
+        self.sample_rate = sample_rate
+        context = multiprocessing.get_context('spawn')  # a fresh interpreter, not a fork of the one running SDL
+        self.process = context.Process(target=render_audio, args=(midi_file, sample_rate), daemon=True)
+        self.process.start()
+
+    def done(self):
+        return not self.process.is_alive()
+
+    def path(self):
+        """
+        Output:
+            Path of the rendered WAV file, or None if the render failed
+        """
+        path = cache_path(self.midi_file, self.sample_rate)
+        return path if os.path.exists(path) else None
+
+
+def background_render(midi_file, sample_rate):
+    """
+    Output:
+        The BackgroundRender of the song, started unless one is running already
+    """
+    for path in [path for path, render in renders.items() if render.done()]:
+        del renders[path]
+    path = cache_path(midi_file, sample_rate)
+    if path not in renders:
+        renders[path] = BackgroundRender(midi_file, sample_rate)
+    return renders[path]
+
+
+class SongAudio:
+    """
+    A song's rendered audio, played through pygame.mixer.music
+    """
+    def __init__(self, midi_file):
+        self.sample_rate = pygame.mixer.get_init()[0]
+        self.path = render_audio(midi_file, self.sample_rate)  # only called once the song is in the cache
+        self.start_sample = 0
+        pygame.mixer.music.load(self.path)
+
+    def play(self, start=0.0):
+        """
+        Starts playback at start seconds of song time
+        """
+        self.start_sample = int(round(start * self.sample_rate))
+        pygame.mixer.music.play(start=self.start_sample / self.sample_rate)
+
+    def stop(self):
+        pygame.mixer.music.stop()
+
+    def sample_position(self):
+        """
+        Output:
+            Index of the sample being heard now, or None when nothing is playing
+
+        get_pos() counts the samples the mixer has consumed since play() (interpolated between mixer
+        callbacks); the samples still queued in the device buffer have not been heard yet.
+        """
+        played = pygame.mixer.music.get_pos()
+        if played < 0 or not pygame.mixer.music.get_busy():
+            return None
+        heard = played * self.sample_rate // 1000 - synth.MIXER_BUFFER
+        return self.start_sample + max(heard, 0)
+
+    def position(self):
+        """
+        Song time in seconds of the sample being heard, or None when nothing is playing
+        """
+        sample = self.sample_position()
+        return None if sample is None else sample / self.sample_rate
@@ -0,0 +1,268 @@
+"""
+benchmark.py
+
+Headless benchmarks for the hot paths: MIDI parsing, key x-location lookups, click hit-testing, frame
+rendering (arrow lane and piano roll) and practice-mode scoring.
+
+Every song in "Music Midis" is measured, plus synthetic stress files generated on the fly with a fixed
+seed: one with a very high note density and one made of huge sustained chords. Each measurement is the
+best of a few repeats. Results are compared with the committed baseline (benchmark_baseline.json) and any
+rate that dropped by more than the tolerance is reported as a regression:
+
+    python benchmark.py                 # compare against the baseline, exit status 1 on a regression
+    python benchmark.py --save          # record the current numbers as the new baseline
+
+Rates depend on the machine, so re-save the baseline on the machine the comparison is run on.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import catalog
+import compositor
+import density
+import KeyPress
+import layout
+import library
+import mido
+import music
+import numpy as np
+import pianoroll
+import practice
+import pygame
+import renderer
+import scheduler
+import timeline
+
+BASELINE_FILE = 'benchmark_baseline.json'
+TOLERANCE = 0.35  # a rate more than this fraction below its baseline is a regression
+REPEATS = 5
+LOOKUPS = 200000
+RENDER_FPS = 60
+MAX_RENDER_FRAMES = 1800  # 30 seconds of song time per render benchmark
+STRESS_SEED = 106
+
+
+def write_dense_file(path, notes=20000, seconds=60.0):
+    """
+    Stress file with notes short enough that many keys change state in every frame
+    """
+    music_file = mido.MidiFile(ticks_per_beat=480)
+    track = mido.MidiTrack()
+    music_file.tracks.append(track)
+    generator = random.Random(STRESS_SEED)
+    ticks_per_note = max(1, int(seconds * 2 * 480 / notes))  # 120 bpm: 960 ticks per second
+    for _ in range(notes):
+        note = generator.randint(21, 108)
+        track.append(mido.Message('note_on', note=note, velocity=generator.randint(1, 127), time=0))
+        track.append(mido.Message('note_off', note=note, velocity=0, time=ticks_per_note))
+    music_file.save(path)
+
+
+def write_chord_file(path, chords=400, chord_size=40):
+    """
+    Stress file of long overlapping chords, for polyphony far above what a pianist can play
+    """
+    music_file = mido.MidiFile(ticks_per_beat=480)
+    generator = random.Random(STRESS_SEED)
+    for voice in range(2):  # two tracks whose chords overlap by half a chord
+        track = mido.MidiTrack()
+        music_file.tracks.append(track)
+        track.append(mido.MetaMessage('set_tempo', tempo=400000 + voice * 100000, time=0))
+        offset = 240 * voice
+        for _ in range(chords):
+            chord = generator.sample(range(21, 109), chord_size)
+            for number, note in enumerate(chord):
+                track.append(mido.Message('note_on', note=note, velocity=80, time=offset if number == 0 else 0))
+            for number, note in enumerate(chord):
+                track.append(mido.Message('note_off', note=note, velocity=0, time=480 if number == 0 else 0))
+            offset = 0
+    music_file.save(path)
+
+
+def best_time(function, repeats=REPEATS):
+    """
+    Output:
+        (fastest wall-clock seconds of repeats calls, result of the last call)
+    """
+    best = math.inf
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def bench_parse(midi_file):
+    """
+    Note events (presses and releases) turned into a timeline per second, without the timeline cache
+    """
+    seconds, song = best_time(lambda: timeline.load_timeline(midi_file, use_cache=False))
+    return len(song.events) / seconds
+
+
+def bench_lookups():
+    """
+    Key x-location lookups and click hit-tests per second
+    """
+    generator = np.random.default_rng(STRESS_SEED)
+    locations = generator.integers(0, KeyPress.TOTAL_PIANO_KEYS, LOOKUPS).tolist()
+    geometry = layout.current
+    clicks = list(zip(generator.integers(0, geometry.width, LOOKUPS).tolist(),
+                      generator.integers(geometry.top_of_keys, geometry.height, LOOKUPS).tolist()))
+    location_array = np.array(locations)
+
+    def single_lookups():
+        for location in locations:
+            KeyPress.KeyPress.get_location_x(location)
+
+    def hit_tests():
+        for x, y in clicks:
+            KeyPress.KeyPress(x, y).key_index()
+
+    return {
+        'lookup/get_location_x': LOOKUPS / best_time(single_lookups)[0],
+        'lookup/get_locations_x': LOOKUPS / best_time(lambda: KeyPress.KeyPress.get_locations_x(location_array))[0],
+        'lookup/hit_test': LOOKUPS / best_time(hit_tests)[0],
+    }
+
+
+def bench_render(midi_file, screen):
+    """
+    Frames per second for the arrow lane (blitted tiles, then the NumPy compositor) and the piano roll, drawing
+    song time frame by frame with no sleeping at the level of detail the song's density profile picks, as the
+    song scene does
+    """
+    song = timeline.load_timeline(midi_file, use_cache=False)
+    profile = density.DensityProfile(song.events, song.length)
+    frames = min(int(math.ceil(song.length * RENDER_FPS)) + 1, MAX_RENDER_FRAMES)
+    theme = catalog.theme_for(midi_file)
+    geometry = layout.current
+
+    lane_height = geometry.top_of_keys - geometry.image_height
+
+    def render_lane(make_lane=lambda: renderer.ArrowLane(geometry.image_height, geometry.note_width, lane_height, theme)):
+        lane = make_lane()
+        clock = scheduler.Scheduler(song.events, song.event_x)
+        for frame in range(frames):
+            pressed, released = clock.due(frame / RENDER_FPS)
+            lane.note_off(released)
+            lane.note_on(pressed)
+            pygame.display.update(lane.flush(screen, merge=profile.level(frame / RENDER_FPS) >= density.REDUCED))
+
+    roll_area = pygame.Rect(0, 0, geometry.width, geometry.top_of_keys)
+    roll = pianoroll.PianoRoll(song, roll_area, geometry.note_width, theme, screen.subsurface(roll_area).copy())
+
+    def render_roll():
+        for frame in range(frames):
+            pygame.display.update(roll.draw(screen, frame / RENDER_FPS, profile.level(frame / RENDER_FPS)))
+
+    def render_array_lane():
+        render_lane(lambda: compositor.ArrayLane(geometry.image_height, geometry.note_width, lane_height, theme,
+                                                 geometry.width, geometry.key_x))
+
+    return (frames / best_time(render_lane)[0], frames / best_time(render_array_lane)[0],
+            frames / best_time(render_roll)[0])
+
+
+def bench_score(midi_file):
+    """
+    Practice-mode presses scored per second: every note of the song played slightly off time, in the order it
+    was played, with the missed notes expired once per RENDER_FPS frame as the song scene does
+    """
+    notes = timeline.load_timeline(midi_file).notes
+    generator = np.random.default_rng(STRESS_SEED)
+    moments = notes['onset'] + generator.uniform(-practice.TOLERANCE, practice.TOLERANCE, len(notes)) / 2
+    order = np.argsort(moments, kind='stable')
+    presses = list(zip(notes['note'][order].tolist(), moments[order].tolist()))
+    frames = np.floor(moments[order] * RENDER_FPS).astype(np.int64).tolist()
+
+    def score():
+        song_score = practice.Score(notes)
+        frame = 0
+        for (note, moment), press_frame in zip(presses, frames):
+            if press_frame > frame:
+                song_score.expire(press_frame / RENDER_FPS)
+                frame = press_frame
+            song_score.press(note, moment)
+        song_score.finish()
+
+    return len(presses) / best_time(score)[0]
+
+
+def run_benchmarks(directory=library.MIDI_DIRECTORY):
+    """
+    Output:
+        Dictionary of benchmark name -> rate (events, lookups or frames per second; higher is better)
+    """
+    pygame.display.init()
+    screen = music.create_music_canvas(None)
+    screen.blit(music.piano_keyboard(), (0, layout.current.top_of_keys))
+    results = bench_lookups()
+    with tempfile.TemporaryDirectory() as stress_directory:
+        stress_files = [os.path.join(stress_directory, 'stress_dense.mid'),
+                        os.path.join(stress_directory, 'stress_chords.mid')]
+        write_dense_file(stress_files[0])
+        write_chord_file(stress_files[1])
+        for midi_file in library.find_midi_files(directory) + stress_files:
+            name = os.path.basename(midi_file)
+            results['parse/' + name] = bench_parse(midi_file)
+            (results['render_lane/' + name], results['render_lane_array/' + name],
+             results['render_roll/' + name]) = bench_render(midi_file, screen)
+            results['score/' + name] = bench_score(midi_file)
+    pygame.display.quit()
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    Output:
+        List of (name, rate, baseline rate) for every rate more than tolerance below its baseline
+    """
+    return [(name, rate, baseline[name]) for name, rate in sorted(results.items())
+            if name in baseline and rate < baseline[name] * (1 - tolerance)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parsing, key lookups and rendering without a window")
+    parser.add_argument('directory', nargs='?', default=library.MIDI_DIRECTORY)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.directory)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+    for name, rate in sorted(results.items()):
+        if name in baseline:
+            print("%-40s %14.0f /s  (baseline %14.0f, %+6.1f%%)" % (
+                name, rate, baseline[name], (rate / baseline[name] - 1) * 100))
+        else:
+            print("%-40s %14.0f /s" % (name, rate))
+
+    if args.save:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump({'results': {name: round(rate, 1) for name, rate in sorted(results.items())}},
+                      baseline_file, indent=2)
+        print("Baseline written to %s" % args.baseline)
+        return
+    regressions = compare(results, baseline, args.tolerance)
+    for name, rate, previous in regressions:
+        print("REGRESSION %s: %.0f /s, baseline %.0f /s" % (name, rate, previous))
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
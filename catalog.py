@@ -0,0 +1,187 @@
+"""
+catalog.py
+
+The song catalog behind the home screen browser.
+
+Every song is described by a small JSON manifest in SONG_DIRECTORY:
+
+    {"title": "Super Mario Bros", "midi": "Music Midis/smbt.mid",
+     "preview": "Images/mario_preview.jpeg", "background": "Images/mario_project2.jpg", "theme": "mario"}
+
+"preview" is the home screen thumbnail and "background" the image above the keys while the song plays;
+both are optional. "theme" names one of themes.themes, or "palette" can list the song's own
+[r, g, b] colors instead. A .mid file in MIDI_DIRECTORY without a manifest is still listed, under its
+file name and the default theme, so adding a song is dropping its file (and optionally a manifest) in.
+
+Manifests that cannot be read, lack a title or midi path, or point at a missing file are skipped and
+reported, as are the files library.py found invalid when the library was last pre-processed.
+
+The catalog is loaded once and keeps a sorted word index of the titles, so a title search is a few
+binary searches however many songs there are.
+"""
+from bisect import bisect_left
+import json
+import os
+import re
+
+import library
+import themes
+
+SONG_DIRECTORY = 'Songs'
+MIDI_DIRECTORY = library.MIDI_DIRECTORY
+
+
+class Song:
+    def __init__(self, title, midi, preview=None, background=None, theme=None, palette=None):
+        self.title = title
+        self.midi = midi
+        self.preview = preview
+        self.background = background
+        self.theme_name = theme
+        self.palette = palette
+        self.song_theme = None  # built on first use from palette
+
+    def theme(self):
+        if self.palette is None:
+            return themes.get(self.theme_name)
+        if self.song_theme is None:
+            self.song_theme = themes.Theme(self.title, [tuple(color) for color in self.palette])
+        return self.song_theme
+
+
+def read_manifest(path):
+    """
+    Output:
+        Song described by a manifest file; raises OSError or ValueError if it cannot be read or lacks a title or
+        midi path
+    """
+    with open(path) as manifest:
+        entry = json.load(manifest)
+    if not isinstance(entry, dict) or not isinstance(entry.get('title'), str) or not isinstance(entry.get('midi'), str):
+        raise ValueError("a manifest needs a \"title\" and a \"midi\" path")
+    return Song(entry['title'], entry['midi'], entry.get('preview'), entry.get('background'), entry.get('theme'),
+                entry.get('palette'))
+
+
+def title_words(text):
+    return re.findall(r'\w+', text.lower())
+
+
+class TitleIndex:
+    """
+    Every word of every title, sorted, for prefix search
+    """
+    def __init__(self, songs):
+        entries = sorted((word, number) for number, song in enumerate(songs) for word in title_words(song.title))
+        self.words = [word for word, number in entries]
+        self.numbers = [number for word, number in entries]
+
+    def matching(self, prefix):
+        """
+        Output:
+            Set of song numbers with a title word starting with prefix
+        """
+        start = bisect_left(self.words, prefix)
+        end = bisect_left(self.words, prefix + '\uffff', start)
+        return set(self.numbers[start:end])
+
+
+class Catalog:
+    def __init__(self, songs):
+        self.songs = sorted(songs, key=lambda song: song.title.lower())
+        self.by_midi = {os.path.normpath(song.midi): song for song in self.songs}
+        self.index = TitleIndex(self.songs)
+
+    def __len__(self):
+        return len(self.songs)
+
+    def find(self, midi_file):
+        """
+        Output:
+            The Song playing midi_file, or None if it is not in the catalog
+        """
+        return self.by_midi.get(os.path.normpath(midi_file))
+
+    def theme_for(self, midi_file):
+        song = None if midi_file is None else self.find(midi_file)
+        return themes.get() if song is None else song.theme()
+
+    def search(self, query):
+        """
+        Output:
+            Songs (in catalog order) whose title has a word starting with each word of query; every song for
+            an empty query
+        """
+        words = title_words(query)
+        if not words:
+            return self.songs
+        numbers = self.index.matching(words[0])
+        for word in words[1:]:
+            numbers &= self.index.matching(word)
+        return [self.songs[number] for number in sorted(numbers)]
+
+
+def load(song_directory=SONG_DIRECTORY, midi_directory=MIDI_DIRECTORY):
+    """
+    Output:
+        Catalog of every readable manifest in song_directory plus every MIDI file in midi_directory without one,
+        less the files library.py found invalid; whatever is skipped is reported
+    """
+    songs = []
+    if os.path.isdir(song_directory):
+        for name in sorted(os.listdir(song_directory)):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(song_directory, name)
+            try:
+                song = read_manifest(path)
+            except (OSError, ValueError) as error:
+                print("skipped song manifest %s (%s: %s)" % (path, type(error).__name__, error))
+                continue
+            if not os.path.isfile(song.midi):
+                print("skipped song manifest %s (no file %s)" % (path, song.midi))
+                continue
+            songs.append(song)
+    listed = {os.path.normpath(song.midi) for song in songs}
+    if os.path.isdir(midi_directory):
+        for midi_file in library.find_midi_files(midi_directory):
+            if os.path.normpath(midi_file) not in listed:
+                title = os.path.splitext(os.path.basename(midi_file))[0].replace('_', ' ').replace('-', ' ')
+                songs.append(Song(title, midi_file))
+    invalid = invalid_files(midi_directory)
+    for song in songs:
+        if os.path.normpath(song.midi) in invalid:
+            print("skipped %s (%s)" % (song.midi, invalid[os.path.normpath(song.midi)]))
+    return Catalog([song for song in songs if os.path.normpath(song.midi) not in invalid])
+
+
+def invalid_files(midi_directory):
+    """
+    Output:
+        Dictionary of normalized path -> error of the files library.py found invalid in midi_directory (empty if
+        the library was never pre-processed)
+    """
+    try:
+        with open(os.path.join(midi_directory, library.MANIFEST_NAME)) as manifest:
+            entries = json.load(manifest)['songs']
+        return {os.path.normpath(entry['file']): entry['error'] for entry in entries if 'error' in entry}
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+loaded = None  # the catalog, read by get() on first use
+
+
+def get():
+    global loaded
+    if loaded is None:
+        loaded = load()
+    return loaded
+
+
+def theme_for(midi_file):
+    """
+    Output:
+        The song's Theme, or the default theme for songs (and the live input) not in the catalog
+    """
+    return get().theme_for(midi_file)
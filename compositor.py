@@ -0,0 +1,142 @@
+"""
+compositor.py
+
+NumPy compositing backend for the arrow lane and the lit keys.
+
+The classes here are drop-in replacements for renderer.ArrowLane and renderer.KeyHighlighter (the song
+scene picks one pair or the other, see music.COMPOSITOR). Instead of one blit per changed key, each keeps
+its whole strip of the window as a surface, plus two tables computed once per window size: which key
+every pixel column (lane) or pixel (keyboard) belongs to, and a palette of every color a key can show.
+A frame's presses, releases and fade steps only update a small per-key state vector. The changed span is
+then recomposed with one palette lookup and one mask through pygame.surfarray, and blitted once.
+"""
+import numpy as np
+import pygame
+import renderer
+
+
+class ArrayLane(renderer.ArrowLane):
+    def __init__(self, top, tile_width, tile_height, theme, width, key_x):
+        """
+        Given:
+            width: width of the window
+            key_x: x-location of every key, in key order (layout.Layout.key_x)
+        """
+        super().__init__(top, tile_width, tile_height, theme)
+        key_x = np.asarray(key_x).tolist()
+        self.key_of_x = {x: key for key, x in enumerate(key_x)}
+        # Neighboring tiles can overlap by a few columns: each column belongs to the last key covering it, and
+        # shows the key before it instead when only that one is lit
+        self.column_keys = np.full(width, len(key_x), dtype=np.int32)  # len(key_x) stands for no key
+        self.under_keys = np.full(width, len(key_x), dtype=np.int32)
+        for key, x in enumerate(key_x):
+            self.under_keys[x:x + tile_width] = self.column_keys[x:x + tile_width]
+            self.column_keys[x:x + tile_width] = key
+        arrow = (pygame.surfarray.array3d(self.build_arrow_tile(renderer.LANE_COLOR)) == renderer.ARROW_COLOR).all(axis=2)
+        self.arrow_mask = self.arrow_columns(arrow, self.column_keys, key_x)
+        self.under_arrow_mask = self.arrow_columns(arrow, self.under_keys, key_x)
+
+        self.surface = pygame.Surface((width, tile_height)).convert()
+        self.surface.fill(renderer.LANE_COLOR)
+        # Palette of mapped pixel values: 0 is the blank lane, 1 + i is arrow tile color i
+        self.lut = np.array([self.surface.map_rgb(color) for color in [renderer.LANE_COLOR] + self.palette.colors],
+                            dtype=np.uint32)
+        self.arrow_pixel = np.uint32(self.surface.map_rgb(renderer.ARROW_COLOR))
+        self.state = np.zeros(len(key_x) + 1, dtype=np.int32)  # palette entry per key, plus the blank "no key"
+
+    def arrow_columns(self, arrow, column_keys, key_x):
+        """
+        Output:
+            (width, tile height) mask of the arrow pixels of the key each column belongs to
+        """
+        key_x = np.append(key_x, 0)
+        offsets = np.clip(np.arange(len(column_keys)) - key_x[column_keys], 0, self.tile_width - 1)
+        mask = arrow[offsets]
+        mask[column_keys == len(key_x) - 1] = False
+        return mask
+
+    def tile_count(self):
+        return 1
+
+    def clear(self, screen):
+        self.pending.clear()
+        self.state[:] = 0
+        return self.compose(screen, 0, len(self.column_keys))
+
+    def flush(self, screen, merge=False):
+        """
+        Applies every change queued since the last flush to the key states and recomposes the columns between
+        the leftmost and rightmost changed key; returns the one rectangle that was touched
+        """
+        changed = []
+        for x, tile_index in self.pending.items():
+            key = self.key_of_x.get(x)
+            value = 0 if tile_index is None else tile_index + 1
+            if key is not None and self.state[key] != value:
+                self.state[key] = value
+                changed.append(x)
+        self.pending.clear()
+        if not changed:
+            return []
+        return [self.compose(screen, min(changed), min(max(changed) + self.tile_width, len(self.column_keys)))]
+
+    def compose(self, screen, left, right):
+        values = self.state[self.column_keys[left:right]]
+        under = self.state[self.under_keys[left:right]]
+        use_under = (values == 0) & (under > 0)
+        values = np.where(use_under, under, values)
+        arrows = np.where(use_under[:, None], self.under_arrow_mask[left:right], self.arrow_mask[left:right])
+        view = pygame.surfarray.pixels2d(self.surface)
+        view[left:right] = np.where(arrows & (values > 0)[:, None], self.arrow_pixel, self.lut[values][:, None])
+        del view  # unlocks the surface for blitting
+        return screen.blit(self.surface, (left, self.top), (left, 0, right - left, self.tile_height))
+
+
+class ArrayKeyHighlighter(renderer.KeyHighlighter):
+    def build_sprites(self):
+        """
+        Instead of sprites: the keyboard's mapped pixels, the pixels of every key's lit area and the palette of
+        lit colors
+        """
+        keyboard = self.keyboard
+        self.surface = self.keys_surface.copy()
+        self.width, self.height = self.surface.get_size()
+        self.base = pygame.surfarray.array2d(self.surface).T.ravel()  # row by row, like the surface's memory
+        self.key_pixels = []  # flat indices into the surface's pixels of the lit area of each key
+        for rect in keyboard.highlight_rects:
+            rows, columns = np.mgrid[rect.top - keyboard.top:rect.bottom - keyboard.top, rect.left:rect.right]
+            self.key_pixels.append((rows * self.width + columns).ravel())
+        colors = len(self.palette.colors)
+        self.lut = np.array([self.surface.map_rgb(self.fade_color(color_index, black, step))
+                             for color_index in range(colors) for black in (False, True)
+                             for step in range(renderer.FADE_STEPS)], dtype=np.uint32)
+
+    def sprite_count(self):
+        return 1
+
+    def draw(self, screen, now):
+        """
+        Writes the fade steps that changed since the last call straight into the keyboard's pixels with one
+        scatter and blits the span of keys they cover; returns the one rectangle that was touched
+        """
+        changes = self.advance(now)
+        if not changes:
+            return []
+        locations = [location for location, color_index, step in changes]
+        entries = [-1 if step is None else (color_index * 2 + self.keyboard.is_black[location]) * renderer.FADE_STEPS + step
+                   for location, color_index, step in changes]
+        indices = [self.key_pixels[location] for location in locations]
+        pixels = np.concatenate(indices)
+        entry_per_pixel = np.repeat(entries, [len(key) for key in indices])
+        view = pygame.surfarray.pixels2d(self.surface).T.reshape(-1)  # a view: 32-bit rows are stored back to back
+        view[pixels] = np.where(entry_per_pixel >= 0, self.lut[np.maximum(entry_per_pixel, 0)], self.base[pixels])
+        del view  # unlocks the surface for blitting
+        rects = [self.keyboard.highlight_rects[location] for location in locations]
+        left = min(rect.left for rect in rects)
+        right = max(rect.right for rect in rects)
+        return [screen.blit(self.surface, (left, self.keyboard.top), (left, 0, right - left, self.height))]
+
+    def clear(self, screen):
+        self.lit.clear()
+        self.surface.blit(self.keys_surface, (0, 0))
+        return [screen.blit(self.surface, (0, self.keyboard.top))]
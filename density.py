@@ -0,0 +1,83 @@
+"""
+density.py
+
+Note density and polyphony of a song over time, used to pick how much detail to draw.
+
+One vectorized pass over a timeline's events sorts them into WINDOW-second windows. For each window it
+records how many note on/off events fall inside it (as events per second) and the most notes sounding at
+once. Every window then gets a level of detail up front, so choosing one during playback is an array lookup:
+
+    FULL: everything is drawn as usual
+    REDUCED: the frame's dirty rectangles are merged into one, released keys go dark at once instead of
+             fading, and piano-roll notes are drawn without outlines
+    MINIMAL: in addition, piano-roll notes of the same key that (nearly) touch on screen are drawn as one
+             rectangle
+
+A window takes the level of the window after it when that one is denser, so detail drops just before a
+dense passage rather than one window into it.
+"""
+import numpy as np
+
+WINDOW = 0.25  # seconds per density window
+
+FULL = 0
+REDUCED = 1
+MINIMAL = 2
+LEVEL_NAMES = ['full', 'reduced', 'minimal']
+
+REDUCED_RATE = 120  # events per second (two per frame at 60 FPS) from which detail is reduced
+MINIMAL_RATE = 480
+REDUCED_POLYPHONY = 24  # notes sounding at once from which detail is reduced
+MINIMAL_POLYPHONY = 64
+
+
+class DensityProfile:
+    def __init__(self, events, length, window=WINDOW):
+        """
+        Given:
+            events: timeline event array (time, on, ...) sorted by time
+            length: song length in seconds
+        """
+        self.window = window
+        times = np.asarray(events['time'])
+        end = max(length, float(times[-1]) if len(times) else 0.0)
+        windows = int(end // window) + 1
+        bins = np.minimum((times // window).astype(np.int64), windows - 1)
+        counts = np.bincount(bins, minlength=windows)
+        self.rate = counts / window
+
+        # Notes sounding after each event; a window's polyphony is the most of those inside it, or what was
+        # still held when it began
+        sounding = np.cumsum(np.where(np.asarray(events['on']), 1, -1))
+        firsts = np.searchsorted(bins, np.arange(windows), 'left')
+        peak = np.zeros(windows, dtype=np.int64)
+        if len(sounding):
+            peak = np.where(counts > 0, np.maximum.reduceat(sounding, np.minimum(firsts, len(sounding) - 1)), 0)
+        lasts = np.searchsorted(bins, np.arange(windows), 'right') - 1  # last event at or before each window
+        held = np.where(lasts >= 0, sounding[np.maximum(lasts, 0)] if len(sounding) else 0, 0)
+        self.polyphony = np.maximum(peak, np.concatenate(([0], held[:-1])))
+
+        levels = np.full(windows, FULL, dtype=np.int8)
+        levels[(self.rate >= REDUCED_RATE) | (self.polyphony >= REDUCED_POLYPHONY)] = REDUCED
+        levels[(self.rate >= MINIMAL_RATE) | (self.polyphony >= MINIMAL_POLYPHONY)] = MINIMAL
+        levels[:-1] = np.maximum(levels[:-1], levels[1:])
+        self.levels = levels
+
+    def level(self, position):
+        """
+        Output:
+            Level of detail (FULL, REDUCED or MINIMAL) for song time position in seconds
+        """
+        window = min(max(int(position / self.window), 0), len(self.levels) - 1)
+        return int(self.levels[window])
+
+    def summary(self):
+        """
+        Output:
+            Dictionary with the peak events per second and polyphony and the seconds spent at each level
+        """
+        seconds = np.bincount(self.levels, minlength=len(LEVEL_NAMES)) * self.window
+        report = {'peak_events_per_second': float(self.rate.max()), 'peak_polyphony': int(self.polyphony.max())}
+        for name, level_seconds in zip(LEVEL_NAMES, seconds.tolist()):
+            report[name + '_seconds'] = level_seconds
+        return report
@@ -0,0 +1,106 @@
+"""
+export.py
+
+Headless export of a song visualization.
+
+Renders the keyboard and note arrows at a fixed frame rate straight from the song's timeline, using
+the SDL dummy video driver so no window opens. Frames are produced as fast as the machine can draw
+them (there is no sleeping), and are written either as numbered PNG files or as one raw RGB stream:
+
+    python export.py "Music Midis/smbt.mid" exported_frames --fps 30
+    python export.py "Music Midis/smbt.mid" exported_frames --raw
+    python export.py "Music Midis/smbt.mid" exported_frames --raw --size 1920x1080 --theme tetris
+    ffmpeg -f rawvideo -pix_fmt rgb24 -s 1150x700 -r 60 -i exported_frames/frames.rgb smbt.mp4
+"""
+import argparse
+import math
+import os
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import catalog
+import layout
+import music
+import pygame
+import scheduler
+import themes
+import timeline
+
+DEFAULT_FPS = 60
+
+
+def export_song(midi_file, output_dir, fps=DEFAULT_FPS, raw=False, size=None, theme=None):
+    """
+    Given:
+        midi_file: song to render
+        output_dir: directory for the frames (created if needed)
+        fps: frames per second of song time
+        raw: write one frames.rgb stream instead of numbered PNGs
+        size: (width, height) of the frames (the current window size if None)
+        theme: themes.Theme for the arrows (the song's own theme from the catalog if None)
+    Output:
+        Dictionary with the number of frames written, seconds taken and frames per second achieved
+    """
+    started = time.perf_counter()
+    if not pygame.display.get_init():
+        pygame.display.init()
+    screen = music.create_music_canvas(midi_file, size)
+    music_timeline = timeline.load_timeline(midi_file)  # after the canvas, so the x-locations match its size
+    os.makedirs(output_dir, exist_ok=True)
+    geometry = layout.current
+    screen.blit(music.piano_keyboard(), (0, geometry.top_of_keys))
+    lane = music.make_lane(geometry, catalog.theme_for(midi_file) if theme is None else theme)
+    clock = scheduler.Scheduler(music_timeline.events, music_timeline.event_x)
+
+    total_frames = int(math.ceil(music_timeline.length * fps)) + 1
+    raw_stream = open(os.path.join(output_dir, 'frames.rgb'), 'wb') if raw else None
+    try:
+        for frame in range(total_frames):
+            pressed, released = clock.due(frame / fps)
+            lane.note_off(released)
+            lane.note_on(pressed)
+            lane.flush(screen)
+            if raw_stream is not None:
+                raw_stream.write(pygame.image.tobytes(screen, 'RGB'))
+            else:
+                pygame.image.save(screen, os.path.join(output_dir, 'frame_%06d.png' % frame))
+    finally:
+        if raw_stream is not None:
+            raw_stream.close()
+
+    seconds = time.perf_counter() - started
+    return {'frames': total_frames, 'seconds': seconds, 'fps': total_frames / seconds if seconds else 0.0}
+
+
+def parse_size(text):
+    """
+    Output:
+        (width, height) from text such as 1920x1080
+    """
+    try:
+        width, height = (int(part) for part in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected WIDTHxHEIGHT, got %r" % text)
+    return width, height
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a song visualization to image frames without a window")
+    parser.add_argument('midi_file')
+    parser.add_argument('output_dir')
+    parser.add_argument('--fps', type=int, default=DEFAULT_FPS)
+    parser.add_argument('--raw', action='store_true', help="write a single raw RGB24 stream instead of PNG files")
+    parser.add_argument('--size', type=parse_size, default=None, metavar='WIDTHxHEIGHT')
+    parser.add_argument('--theme', choices=sorted(themes.themes), default=None,
+                        help="color theme (default: the song's own)")
+    args = parser.parse_args()
+
+    theme = None if args.theme is None else themes.get(args.theme)
+    report = export_song(args.midi_file, args.output_dir, args.fps, args.raw, args.size, theme)
+    print("%s: %d frames in %.1f s (%.1f frames per second)" % (
+        args.midi_file, report['frames'], report['seconds'], report['fps']))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+layout.py
+
+Window geometry for every screen, computed once per window size.
+
+A Layout holds everything that depends on the window size: where the song image ends, where the keys
+start, the rectangle of every white and black key of the 88-key and 36-key keyboards (and the part of
+each that lights up when it is pressed), and the x-location of each of the 88 keys for the note arrows.
+Layouts are cached by size, so drawing a keyboard or resolving a click only reads rectangles that were
+computed when the window got that size, and resizing back to an earlier size costs nothing.
+
+The window is resizable (and F11 switches to full screen, see scenes.SceneManager); set_mode() opens it
+at a size and makes that size's layout current.
+"""
+from collections import OrderedDict
+import numpy as np
+import pygame
+
+DEFAULT_SIZE = (1150, 700)
+MIN_SIZE = (460, 280)
+LAYOUTS_KEPT = 4  # most recently used window sizes whose layouts are kept; dragging a window passes through many
+
+PIANO_WHITE_KEYS = 52
+TOTAL_PIANO_KEYS = 88
+INTERACTIVE_WHITE_KEYS = 21
+TOTAL_INTERACTIVE_KEYS = 36
+
+BLACK_KEYS_FROM_A = (1, 4, 6, 9, 11)  # semitones above A that are black keys
+
+white_key_locations = [0, 2, 3, 5, 7, 8, 10, 12, 14, 15, 17, 19, 20, 22, 24, 26, 27, 29, 31, 32, 34,
+                       36, 38, 39, 41, 43, 44, 46, 48, 50, 51, 53, 55, 56, 58, 60, 62, 63, 65, 67,
+                       68, 70, 72, 74, 75, 77, 79, 80, 82, 84, 86, 87]  # 0-87 locations of the 88-key white keys
+
+
+class Keyboard:
+    """
+    Key rectangles of one keyboard drawn across the bottom quarter of the window
+    """
+    def __init__(self, width, height, white_keys, total_keys):
+        self.white_keys = white_keys
+        self.top = height * 3 // 4
+        self.white_width = width // white_keys
+        self.white_height = height // 4
+        self.black_width = int(self.white_width * (1 / 2))
+        self.black_height = int(self.white_height * 2 / 3)
+
+        # One extra white rectangle fills the columns left over by the integer key width
+        self.white_rects = [pygame.Rect(i * width // white_keys, self.top, self.white_width, self.white_height)
+                            for i in range(white_keys + 1)]
+        self.black_keys = []  # (index of the white key to the left, rect)
+        for group_start, offset in black_key_positions(white_keys, total_keys):
+            left = (group_start * width // white_keys + self.white_width * offset
+                    + self.white_width - (self.black_width // 3))
+            rect = pygame.Rect(left, self.top, self.black_width, self.black_height)
+            self.black_keys.append((group_start + offset, rect))
+
+        # Area lit when a key is pressed, per key in chromatic order from the lowest A: the part of a white key
+        # below the black keys, or the inside of a black key
+        whites = iter(self.white_rects)
+        blacks = iter(rect for white_key, rect in self.black_keys)
+        self.highlight_rects = []
+        self.is_black = [location % 12 in BLACK_KEYS_FROM_A for location in range(total_keys)]
+        for black in self.is_black:
+            if black:
+                self.highlight_rects.append(next(blacks).inflate(-2, -2))
+            else:
+                white = next(whites)
+                self.highlight_rects.append(pygame.Rect(white.left + 1, self.top + self.black_height,
+                                                        white.width - 1, self.white_height - self.black_height))
+
+
+def black_key_positions(white_keys, total_keys):
+    """
+    Output:
+        (group start, offset) pairs of the white key each black key sits to the right of, for a keyboard
+        starting on A; black keys are placed per group of the octave, as the keys were always drawn
+    """
+    positions = [(0, 0)]
+    for group_start in range(2, white_keys, 7):
+        positions += [(group_start, offset) for offset in (0, 1, 3, 4, 5) if group_start + offset < white_keys]
+    return positions[:total_keys - white_keys]
+
+
+def build_key_tables(width):
+    """
+    Given:
+        width: width of the 88-key display
+    Output:
+        (x, width) arrays indexed by key location 0-87
+
+    Process:
+        A white key sits after however many white keys come before it and is offset a third of a key width;
+        a black key is placed two thirds of the way across the white key to its left
+    """
+    white_key_width = width / PIANO_WHITE_KEYS
+    locations = np.arange(TOTAL_PIANO_KEYS)
+    is_white = np.isin(locations, white_key_locations)
+    whites_before = np.cumsum(is_white) - is_white  # white keys strictly to the left of each location
+    key_x = np.where(is_white,
+                     white_key_width * whites_before + white_key_width / 3,
+                     white_key_width * (whites_before - 1) + white_key_width * 2 / 3).astype(np.int32)
+    key_width = np.where(is_white, int(white_key_width), int(white_key_width / 2)).astype(np.int32)
+    return key_x, key_width
+
+
+class Layout:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.size = (width, height)
+        self.image_height = height * 2 // 3  # bottom of the song image; the arrow lane runs from here to the keys
+        self.top_of_keys = height * 3 // 4
+        self.note_width = width // TOTAL_PIANO_KEYS  # width of an arrow tile or a falling note
+        self.piano = Keyboard(width, height, PIANO_WHITE_KEYS, TOTAL_PIANO_KEYS)
+        self.interactive = Keyboard(width, height, INTERACTIVE_WHITE_KEYS, TOTAL_INTERACTIVE_KEYS)
+        self.key_x, self.key_width = build_key_tables(width)
+        self.tables = {}  # lookup tables other modules derive from this layout (see KeyPress), dropped with it
+
+
+layouts = OrderedDict()  # (width, height) -> Layout, least recently used first
+fullscreen = False
+windowed_size = DEFAULT_SIZE  # window size to return to when leaving full screen
+
+
+def get(width, height):
+    size = (max(width, MIN_SIZE[0]), max(height, MIN_SIZE[1]))
+    if size in layouts:
+        layouts.move_to_end(size)
+        return layouts[size]
+    layouts[size] = Layout(*size)
+    while len(layouts) > LAYOUTS_KEPT:
+        layouts.popitem(last=False)
+    return layouts[size]
+
+
+current = get(*DEFAULT_SIZE)
+
+
+def set_mode(size=None):
+    """
+    Opens the window at size (the current size if None), resizable or full screen, and makes its layout current
+
+    Output:
+        The display surface
+    """
+    global current
+    if fullscreen:
+        screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+    else:
+        size = get(*(size or current.size)).size
+        screen = pygame.display.set_mode(size, pygame.RESIZABLE)
+        if screen.get_size() != size:  # Leaving full screen, SDL can keep the old size for one more call
+            screen = pygame.display.set_mode(size, pygame.RESIZABLE)
+    current = get(*screen.get_size())
+    return screen
+
+
+def toggle_fullscreen():
+    """
+    Switches between the window and full screen; returns the new display surface
+    """
+    global fullscreen, windowed_size
+    fullscreen = not fullscreen
+    if fullscreen:
+        windowed_size = current.size
+        return set_mode()
+    return set_mode(windowed_size)
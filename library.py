@@ -0,0 +1,100 @@
+"""
+library.py
+
+Batch pre-processing of the MIDI library.
+
+Every .mid file in a directory is parsed into the playback timeline format in parallel, one file per
+worker process. Each file is validated, its timeline is stored in the on-disk timeline cache (so the
+first click on a song does not parse it), and a manifest with its duration, note count, maximum
+polyphony and note density (see density.py) is written next to the songs. With --audio every song is
+also rendered into the audio cache (see audio.py):
+
+    python library.py "Music Midis"
+    python library.py "Music Midis" --audio
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import json
+import os
+import time
+
+import audio
+import density
+import timeline
+
+MIDI_DIRECTORY = 'Music Midis'
+MANIFEST_NAME = 'manifest.json'
+
+
+def find_midi_files(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.lower().endswith(('.mid', '.midi')))
+
+
+def process_file(midi_file, render_audio=False):
+    """
+    Worker: parses one file (and renders its audio if asked) and returns its manifest entry (with an 'error'
+    instead of stats if it is invalid)
+    """
+    entry = {'file': midi_file}
+    try:
+        song = timeline.load_timeline(midi_file)
+    except Exception as error:  # mido raises several different types for corrupt files
+        entry['error'] = "%s: %s" % (type(error).__name__, error)
+        return entry
+    if len(song) == 0:
+        entry['error'] = "no notes"
+        return entry
+    entry['duration'] = round(float(song.length), 3)
+    entry['notes'] = len(song)
+    entry['max_polyphony'] = song.max_polyphony()
+    entry.update(density.DensityProfile(song.events, song.length).summary())
+    if render_audio:
+        audio.render_audio(midi_file)
+    return entry
+
+
+def build_manifest(directory=MIDI_DIRECTORY, workers=None, render_audio=False):
+    """
+    Given:
+        directory: folder of MIDI files
+        workers: number of processes (defaults to the number of CPU cores)
+        render_audio: also render every valid song into the audio cache
+    Output:
+        List of manifest entries in file name order
+    """
+    midi_files = find_midi_files(directory)
+    if not midi_files:
+        return []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(partial(process_file, render_audio=render_audio), midi_files, chunksize=max(1, len(midi_files) // 64)))
+
+
+def write_manifest(entries, path):
+    with open(path, 'w') as manifest:
+        json.dump({'songs': entries}, manifest, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse every MIDI file in a folder and write a manifest")
+    parser.add_argument('directory', nargs='?', default=MIDI_DIRECTORY)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--manifest', default=None, help="manifest path (default: <directory>/%s)" % MANIFEST_NAME)
+    parser.add_argument('--audio', action='store_true', help="also render every song into the audio cache")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    entries = build_manifest(args.directory, args.workers, args.audio)
+    manifest_path = args.manifest or os.path.join(args.directory, MANIFEST_NAME)
+    write_manifest(entries, manifest_path)
+
+    failed = [entry for entry in entries if 'error' in entry]
+    for entry in failed:
+        print("invalid: %s (%s)" % (entry['file'], entry['error']))
+    print("%d files (%d invalid) processed in %.2f s, manifest written to %s" % (
+        len(entries), len(failed), time.perf_counter() - started, manifest_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+live.py
+
+Note input sources for the live MIDI mode.
+
+Every source delivers mido messages into one thread-safe inbox, stamped with the moment they arrived.
+The live scene drains the inbox once per frame, so the MIDI thread never touches pygame and the render
+loop never blocks on MIDI. Sources:
+
+    PortInput: a hardware or loopback MIDI input port, or a new virtual port (needs a mido backend such as python-rtmidi)
+    FileReplay: plays a .mid file's messages in real time on a thread, a stand-in for a keyboard when testing
+"""
+from collections import deque
+import mido
+import queue
+import threading
+import time
+
+LATENCY_SAMPLES = 10000  # most recent input-to-pixel measurements kept for the report
+
+
+class InputSource:
+    def __init__(self):
+        self.inbox = queue.SimpleQueue()
+
+    def receive(self, message):
+        """
+        Called from the MIDI thread for every incoming message
+        """
+        if message.type == 'note_on' or message.type == 'note_off':
+            self.inbox.put((time.perf_counter(), message))
+
+    def start(self):
+        """
+        Called by the scene once it is ready for notes
+        """
+
+    def drain(self):
+        """
+        Output:
+            List of (arrival time, message) received since the last call
+        """
+        received = []
+        while True:
+            try:
+                received.append(self.inbox.get_nowait())
+            except queue.Empty:
+                return received
+
+    def close(self):
+        pass
+
+
+class PortInput(InputSource):
+    def __init__(self, port_name=None, virtual=False):
+        """
+        Opens port_name (the first available input if None); virtual=True creates a new port under that name
+        """
+        super().__init__()
+        self.port = mido.open_input(port_name, virtual=virtual, callback=self.receive)
+        self.name = self.port.name
+
+    def close(self):
+        self.port.close()
+
+
+class FileReplay(InputSource):
+    def __init__(self, midi_file):
+        super().__init__()
+        self.name = midi_file
+        self.music = mido.MidiFile(midi_file)
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.replay, name="midi-replay", daemon=True)
+
+    def start(self):
+        if self.thread.ident is None:  # not started yet
+            self.thread.start()
+
+    def replay(self):
+        for message in self.music.play():  # play() sleeps between messages like a performer would
+            if self.stopping.is_set():
+                return
+            self.receive(message)
+
+    def close(self):
+        self.stopping.set()
+
+
+class LatencyMeter:
+    """
+    Input-to-pixel latency: time from a message's arrival to the display update that first shows it
+    """
+    def __init__(self):
+        self.samples = deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, arrival_times, shown_at):
+        for arrival in arrival_times:
+            self.samples.append(shown_at - arrival)
+
+    def report(self):
+        """
+        Output:
+            Dictionary with the number of measurements and the mean, 95th percentile and max latency in seconds
+        """
+        if not self.samples:
+            return {'events': 0, 'mean': 0.0, 'p95': 0.0, 'max': 0.0}
+        ordered = sorted(self.samples)
+        return {
+            'events': len(ordered),
+            'mean': sum(ordered) / len(ordered),
+            'p95': ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)],
+            'max': ordered[-1],
+        }
@@ -0,0 +1,211 @@
+"""
+metrics.py
+
+Performance instrumentation for the song and interactive screens.
+
+A Metrics object collects the length of every frame and how long each stage of it took (event handling,
+the scene update with its scheduling, drawing and display.update, and the sleep until the next frame), plus
+one-off setup timings, counters such as surfaces allocated, and the lag of every note event behind the
+audio clock. Recording is a perf_counter() pair and a dictionary add, cheap enough to leave on.
+The numbers can be shown live with Overlay (F3 during a song) and are dumped to JSON and CSV files.
+
+Only the most recent frames and lags are kept (ring buffers of a fixed length), with running totals for the
+whole run, so a screen left open all day keeps the same memory and the overlay the same cost.
+"""
+from collections import deque
+import csv
+from itertools import islice
+import json
+import os
+import pygame
+import time
+
+METRICS_DIRECTORY = 'metrics'
+RECENT_FRAMES = 600  # frames kept for the statistics of screens whose frames are not dumped (10 s at 60 FPS)
+DUMPED_FRAMES = 36000  # frames kept for the per-frame CSV of a dumped song (the last 10 minutes at 60 FPS)
+LAGS_KEPT = 4096  # most recent event lags the lag percentiles are taken over
+OVERLAY_INTERVAL = 0.25  # seconds between overlay refreshes
+OVERLAY_COLOR = (255, 255, 255)
+OVERLAY_BACKGROUND = (0, 0, 0)
+
+
+class Metrics:
+    def __init__(self, name, frames_kept=RECENT_FRAMES):
+        self.name = name
+        self.started = time.perf_counter()
+        self.frames = deque(maxlen=frames_kept)  # one {stage: seconds} dictionary per recent frame
+        self.frame_times = deque(maxlen=frames_kept)  # seconds from the start of each frame to the start of the next
+        self.frame_count = 0  # every frame finished, including the ones no longer kept
+        self.current = {}
+        self.setup = {}  # stage -> seconds for work done once, such as loading the song
+        self.counters = {}
+        self.lags = deque(maxlen=LAGS_KEPT)  # seconds each recently fired note event was behind the clock
+        self.max_lag = 0.0  # over the whole run
+
+    def add(self, stage, seconds):
+        self.current[stage] = self.current.get(stage, 0.0) + seconds
+
+    def once(self, stage, seconds):
+        self.setup[stage] = self.setup.get(stage, 0.0) + seconds
+
+    def count(self, counter, amount=1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def lag(self, seconds):
+        self.lags.append(seconds)
+        self.max_lag = max(self.max_lag, seconds)
+
+    def end_frame(self, seconds):
+        self.frames.append(self.current)
+        self.frame_times.append(seconds)
+        self.frame_count += 1
+        self.current = {}
+
+    def summary(self, last_frames=None):
+        """
+        Output:
+            Dictionary of frame-time and per-stage percentiles (ms) over the frames kept, event-lag percentiles (ms)
+            over the lags kept (with the maximum of the whole run), setup times (ms) and counter totals/rates;
+            last_frames limits the frame statistics to the most recent frames
+        """
+        frames = list(islice(reversed(self.frames), last_frames))  # newest first; the order does not matter
+        frame_times = list(islice(reversed(self.frame_times), last_frames))
+        elapsed = time.perf_counter() - self.started
+        stages = sorted({stage for frame in frames for stage in frame})
+        lag_ms = percentiles([lag * 1000 for lag in self.lags])
+        lag_ms['max'] = self.max_lag * 1000
+        result = {
+            'name': self.name,
+            'seconds': elapsed,
+            'frames': self.frame_count,
+            'frame_ms': percentiles([seconds * 1000 for seconds in frame_times]),
+            'stages_ms': {stage: percentiles([frame.get(stage, 0.0) * 1000 for frame in frames]) for stage in stages},
+            'event_lag_ms': lag_ms,
+            'setup_ms': {stage: seconds * 1000 for stage, seconds in self.setup.items()},
+            'counters': dict(self.counters),
+            'per_second': {counter: total / elapsed for counter, total in self.counters.items()} if elapsed else {},
+        }
+        return result
+
+    def dump(self, directory=METRICS_DIRECTORY):
+        """
+        Writes <name>-<time>.json (the summary) and <name>-<time>.csv (one row per frame kept); returns the JSON
+        path
+        """
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, "%s-%s" % (os.path.splitext(os.path.basename(self.name))[0],
+                                                  time.strftime('%Y%m%d-%H%M%S')))
+        with open(base + '.json', 'w') as summary_file:
+            json.dump(self.summary(), summary_file, indent=2)
+        stages = sorted({stage for frame in self.frames for stage in frame})
+        with open(base + '.csv', 'w', newline='') as frames_file:
+            writer = csv.writer(frames_file)
+            writer.writerow(['frame', 'total_ms'] + [stage + '_ms' for stage in stages])
+            first = self.frame_count - len(self.frames)  # frames before this one were dropped
+            for number, (frame, seconds) in enumerate(zip(self.frames, self.frame_times), first):
+                writer.writerow([number, round(seconds * 1000, 3)] +
+                                [round(frame.get(stage, 0.0) * 1000, 3) for stage in stages])
+        return base + '.json'
+
+
+def percentiles(values):
+    if not values:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    return {
+        'p50': ordered[last // 2],
+        'p95': ordered[int(last * 0.95)],
+        'p99': ordered[int(last * 0.99)],
+        'max': ordered[last],
+    }
+
+
+class Panel:
+    """
+    Text panel blitted over a screen. The text is re-rendered only when changed() says so and at most every
+    interval seconds, and the finished panel is blitted in between; subclasses supply the text with text_lines()
+    """
+    interval = OVERLAY_INTERVAL
+
+    def __init__(self, screen, metrics, rect, line_height, font_size):
+        self.screen = screen
+        self.metrics = metrics
+        self.rect = rect
+        self.background = screen.subsurface(self.rect).copy()  # what the panel covers, put back when it goes away
+        self.panel = pygame.Surface(self.rect.size).convert()
+        self.panel.fill(OVERLAY_BACKGROUND)
+        self.font = pygame.font.Font(None, font_size)
+        self.line_height = line_height
+        self.last_rendered = 0.0
+        metrics.count('surfaces', 2)
+
+    def show(self):
+        """
+        Blits the panel as last rendered; returns the rectangle to update
+        """
+        return self.screen.blit(self.panel, self.rect)
+
+    def draw(self, redraw=False):
+        """
+        Re-renders and blits the panel if its text is due, or blits it as it is with redraw=True (for screens that
+        paint over it every frame); returns the rectangle to update or None
+        """
+        now = time.perf_counter()
+        if self.changed() and now - self.last_rendered >= self.interval:
+            self.last_rendered = now
+            self.render_text()
+        elif not redraw:
+            return None
+        return self.show()
+
+    def changed(self):
+        return True
+
+    def text_lines(self):
+        raise NotImplementedError
+
+    def render_text(self):
+        lines = self.text_lines()
+        self.panel.fill(OVERLAY_BACKGROUND)
+        for number, line in enumerate(lines):
+            self.panel.blit(self.font.render(line, True, OVERLAY_COLOR), (4, 2 + number * self.line_height))
+        self.metrics.count('surfaces', len(lines))  # font.render allocates one surface per line
+
+
+class Overlay(Panel):
+    """
+    Small panel in the top-left corner showing the latest metrics, refreshed a few times a second while visible
+    """
+    def __init__(self, screen, metrics, width=360, line_height=18, lines=9):
+        super().__init__(screen, metrics, pygame.Rect(0, 0, width, line_height * lines + 4), line_height,
+                         line_height + 4)
+        self.lines = lines
+        self.visible = False
+
+    def toggle(self):
+        """
+        Shows or hides the overlay; returns the rectangle to update
+        """
+        self.visible = not self.visible
+        if not self.visible:
+            self.screen.blit(self.background, self.rect)
+            return self.rect
+        self.last_rendered = 0.0
+        return self.draw()
+
+    def draw(self, redraw=False):
+        if not self.visible:
+            return None
+        return super().draw(redraw)
+
+    def text_lines(self):
+        summary = self.metrics.summary(last_frames=120)
+        frame = summary['frame_ms']
+        lag = summary['event_lag_ms']
+        stages = summary['stages_ms']
+        lines = ["frame p50 %.1f  p95 %.1f  max %.1f ms" % (frame['p50'], frame['p95'], frame['max']),
+                 "event lag p50 %.1f  p95 %.1f  max %.1f ms" % (lag['p50'], lag['p95'], lag['max'])]
+        lines += ["%s p95 %.2f ms" % (stage, stages[stage]['p95']) for stage in sorted(stages) if stage != 'sleep']
+        lines.append("surfaces/s %.1f" % summary['per_second'].get('surfaces', 0.0))
+        return lines[:self.lines]
@@ -7,390 +7,867 @@ This program contains an interactive piano and a music player/displayer GUI.
 
 MIDI files were taken from vgmusic.com and jacobspiano.com/midi-files
 """
+import argparse
+import assets
+import audio
+import catalog
+import compositor
+import density
 import KeyPress
-import mido
+import layout
+import live
+import metrics
+import os
+import pianoroll
+import practice
 import pygame
-import random
+import renderer
+import scenes
+import scheduler
+import stream
+import synth
+import themes
 import time
+import timeline
 
-midi_files = ['Music Midis/smbt.mid', 'Music Midis/bloody.mid',  'Music Midis/Gravity-Falls-MIDI.mid', 'Music Midis/wheel.mid', 'Music Midis/Pianotris.mid']
+FPS = 60
+LIVE_FPS = 240  # The live scene polls its MIDI inbox this often so a note reaches the screen within one 60 FPS frame
 
-CANVAS_WIDTH = 1150
-CANVAS_HEIGHT = 700
+SEEK_STEP = 5.0  # seconds skipped by the arrow keys during a song
+RATE_STEP = 0.25
+MIN_RATE = 0.25
+MAX_RATE = 2.0
 
-IMAGE_HEIGHT = CANVAS_HEIGHT * 2 // 3
+PAGE_SIZE = 5  # songs per page of the home screen browser
+SEARCH_BAR_HEIGHT = 24
+SEARCH_BAR_COLOR = (40, 40, 40)
+SEARCH_TEXT_COLOR = (230, 230, 230)
 
-PIANO_WHITE_KEYS = 52
-TOTAL_PIANO_KEYS = 88
-TOP_OF_KEYS = CANVAS_HEIGHT * 3 // 4
+CLICK_VELOCITY = 100  # velocity a mouse click on the interactive piano counts as when lighting its key
+INTRO_ANIMATION = True  # Draw the 88 keys one by one over INTRO_TIME when a song starts; the song begins once they are all drawn
+INTRO_TIME = 1.5  # seconds
+COMPOSITOR = 'blit'  # 'array' composes the arrow lane and lit keys as NumPy arrays instead (see compositor.py)
+STREAM_THRESHOLD = 256 * 1024  # Uncached MIDI files at least this many bytes are streamed instead of parsed up front
+WARM_UP_ASSETS = True  # Decode the fixed images and keyboards at startup so no screen change waits on a decode
+SHOW_METRICS = False  # Start songs and the interactive piano with the performance overlay on (F3 toggles it)
+DUMP_METRICS = True  # Write each song's frame timings and event lag to metrics.METRICS_DIRECTORY when it ends
 
-INTERACTIVE_WHITE_KEYS = 21
-TOTAL_INTERACTIVE_KEYS = 36
+asset_cache = assets.SurfaceCache()  # Scaled, display-ready images and keyboards shared by every screen
 
-# Below are the color schemes for each song, background color for each note is chosen randomly from the applicable list
-mario_note_colors = [(248, 222, 126), (255, 0, 0), (0, 255, 0), (0, 0, 255), (101, 67, 33)]
-bloody_note_colors = [(255, 90, 54), (178, 34, 34), (220, 220, 220), (100, 100, 100), (200, 200, 200), (255, 255, 0)]
-tetris_note_colors = [(255, 50, 19), (3, 65, 174), (114, 203, 59), (255, 213, 0), (255, 151, 28)]
-wheel_note_colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 105, 180), (255, 69, 0), (255, 255, 0)]
-gravity_note_colors = [(0, 128, 128), (255, 42, 4), (0, 0, 200), (0, 255, 0), (0, 128, 128), (255, 42, 4), (0, 0, 200), (0, 255, 0), (0, 128, 128), (255, 42, 4)]
-interactive_piano_colors = [(255, 255, 255)]
 
+def main():
+    global COMPOSITOR
+    parser = argparse.ArgumentParser(description="Interactive piano and MIDI music displayer")
+    parser.add_argument('--live', nargs='?', const='', metavar='PORT',
+                        help="start in live mode on a MIDI input port (the first one if no name is given)")
+    parser.add_argument('--virtual', metavar='NAME', help="start in live mode on a new virtual MIDI input port")
+    parser.add_argument('--replay', metavar='MIDI_FILE', help="start in live mode, fed by replaying a MIDI file")
+    parser.add_argument('--practice', metavar='MIDI_FILE',
+                        help="start practicing a song, scored from clicks or from --live/--virtual/--replay input")
+    parser.add_argument('--compositor', choices=['blit', 'array'], default=COMPOSITOR,
+                        help="how the arrow lane and lit keys are drawn (default: %(default)s)")
+    args = parser.parse_args()
+    COMPOSITOR = args.compositor
+
+    synth.pre_init()
+    pygame.init()
+    create_starting_canvas()  # The display has to exist before images can be converted for the cache
+    if WARM_UP_ASSETS:
+        warm_up_assets()
+    InteractiveScene.load_sounds()
+    try:
+        source = None
+        if args.replay is not None:
+            source = live.FileReplay(args.replay)
+        elif args.virtual is not None:
+            source = live.PortInput(args.virtual, virtual=True)
+        elif args.live is not None:
+            source = live.PortInput(args.live or None)
+        if args.practice is not None:
+            first_scene = PracticeScene(args.practice, source)
+        elif source is not None:
+            first_scene = LiveScene(source)
+        else:
+            first_scene = HomeScene()
+    except (ImportError, OSError) as error:  # No MIDI backend installed, no such port or no such file
+        pygame.quit()
+        parser.error("MIDI input unavailable: %s" % error)
+    scenes.SceneManager(FPS).run(first_scene)
 
-preview_images = ['Images/mario_preview.jpeg', 'Images/castlevania_preview.png', 'Images/gravity_preview.jpeg', 'Images/wheel_preview.jpg', 'Images/tetris_preview.jpg']
 
+class HomeScene(scenes.Scene):
+    """
+    Start screen: a page of songs from the catalog along the bottom and the interactive piano button at the top;
+    clicking a song plays it, right-clicking it plays it in practice mode
 
-class Midi:
+    Left/Right (or the mouse wheel) turn the page; / starts a title search, typed letters narrow it down,
+    Enter plays the first match and Escape clears it. M opens live mode when no search is being typed.
+    Thumbnails are decoded in the background, so a page shows its titles at once and fills in the images
+    as they arrive.
+    """
+    loader = None  # Background thumbnail decoder shared by every visit
+    font = None
+
+    def __init__(self):
+        self.catalog = catalog.get()
+        self.results = self.catalog.songs
+        self.query = ''
+        self.searching = False
+        self.page = 0
+        self.tiles = []  # (rect, song, preview cache key or None) of each song on the page
+
+    def enter(self, manager):
+        super().enter(manager)
+        if HomeScene.loader is None:
+            HomeScene.loader = assets.ImageLoader(asset_cache)
+            HomeScene.font = pygame.font.Font(None, SEARCH_BAR_HEIGHT)
+        self.resize(None)
+
+    def resize(self, size):
+        create_starting_canvas(size)
+        self.draw_browser()
+        pygame.display.update()
+
+    def page_count(self):
+        return max(1, -(-len(self.results) // PAGE_SIZE))
+
+    def turn_page(self, pages):
+        page = min(max(self.page + pages, 0), self.page_count() - 1)
+        if page != self.page:
+            self.page = page
+            pygame.display.update(self.draw_browser())
+
+    def set_query(self, query):
+        self.query = query
+        self.results = self.catalog.search(query)
+        self.page = 0
+        pygame.display.update(self.draw_browser())
+
+    def draw_browser(self):
+        """
+        Draws the current page of songs and the search bar, asks for the thumbnails that are not decoded yet
+        and returns the rectangle to update
+        """
+        screen = pygame.display.get_surface()
+        width, height = layout.current.size
+        strip = pygame.Rect(0, height * 3 // 4, width, height - height * 3 // 4)
+        tile_size = (width // PAGE_SIZE, height // 4)
+        screen.fill((255, 255, 0), strip)
+        self.tiles = []
+        first = self.page * PAGE_SIZE
+        for i, song in enumerate(self.results[first:first + PAGE_SIZE]):
+            rect = pygame.Rect(int((width / PAGE_SIZE) * i), strip.top, *tile_size)
+            self.tiles.append((rect, song, None if song.preview is None else (song.preview, tile_size)))
+            self.draw_tile(screen, self.tiles[-1])
+
+        wanted = [key for rect, song, key in self.tiles if key is not None]
+        following = self.results[first + PAGE_SIZE:first + 2 * PAGE_SIZE]  # prefetched for the next page turn
+        wanted += [(song.preview, tile_size) for song in following if song.preview is not None]
+        image_size = (width, layout.current.image_height)
+        if PAGE_SIZE * width * image_size[1] * 4 <= asset_cache.budget // 4:  # song backgrounds, if they fit easily
+            wanted += [(song.background, image_size) for rect, song, key in self.tiles if song.background is not None]
+        HomeScene.loader.request(wanted)
+
+        bar = pygame.Rect(0, strip.top - SEARCH_BAR_HEIGHT, width, SEARCH_BAR_HEIGHT)
+        screen.fill(SEARCH_BAR_COLOR, bar)
+        if self.searching or self.query:
+            text = "Search: %s%s   (%d of %d songs)" % (self.query, '_' if self.searching else '',
+                                                       len(self.results), len(self.catalog))
+        else:
+            text = "/ to search, right-click a song to practice it"
+        text += "   page %d/%d" % (self.page + 1, self.page_count())
+        screen.blit(HomeScene.font.render(text, True, SEARCH_TEXT_COLOR), (6, bar.top + 3))
+        return bar.union(strip)
+
+    def draw_tile(self, screen, tile):
+        """
+        Blits a song's thumbnail, or its title on a blank tile while there is no thumbnail to show
+        """
+        rect, song, key = tile
+        preview = None if key is None else asset_cache.find(key)
+        if preview is not None:
+            return screen.blit(preview, rect)
+        screen.fill((230, 230, 230), rect)
+        pygame.draw.rect(screen, (0, 0, 0), rect, 1)
+        title = HomeScene.font.render(song.title, True, (0, 0, 0))
+        return screen.blit(title, title.get_rect(center=rect.center), area=pygame.Rect((0, 0), rect.size))
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button in (1, 2, 3):
+            mouse_position = event.pos
+            width, height = layout.current.size
+            for rect, song, key in self.tiles:
+                if rect.collidepoint(mouse_position):
+                    self.manager.switch(PracticeScene(song.midi) if event.button == 3 else SongScene(song.midi))
+                    return
+            if width * 2 // 5 <= mouse_position[0] <= width * 3 // 5 and height // 4 >= mouse_position[1]:
+                self.manager.switch(InteractiveScene())  # Interactive piano
+        elif event.type == pygame.MOUSEWHEEL:
+            self.turn_page(-event.y)
+        elif event.type == pygame.KEYDOWN:
+            self.handle_key(event)
+
+    def handle_key(self, event):
+        if event.key in (pygame.K_RIGHT, pygame.K_PAGEDOWN):
+            self.turn_page(1)
+        elif event.key in (pygame.K_LEFT, pygame.K_PAGEUP):
+            self.turn_page(-1)
+        elif event.key == pygame.K_ESCAPE:
+            self.searching = False
+            self.set_query('')
+        elif event.key == pygame.K_RETURN:
+            if self.results:
+                self.manager.switch(SongScene(self.results[0].midi))
+        elif not self.searching and event.key == pygame.K_SLASH:
+            self.searching = True
+            pygame.display.update(self.draw_browser())
+        elif not self.searching and event.key == pygame.K_m:  # Live mode from the first MIDI input port
+            try:
+                self.manager.switch(LiveScene(live.PortInput()))
+            except (ImportError, OSError) as error:  # No MIDI backend installed or no input port connected
+                print("MIDI input unavailable: %s" % error)
+        elif self.searching and event.key == pygame.K_BACKSPACE:
+            self.set_query(self.query[:-1])
+        elif self.searching and event.unicode.isprintable() and event.unicode:
+            self.set_query(self.query + event.unicode)
+
+    def update(self):
+        ready = set(HomeScene.loader.collect())
+        if ready:
+            screen = pygame.display.get_surface()
+            pygame.display.update([self.draw_tile(screen, tile) for tile in self.tiles if tile[2] in ready])
+
+
+def create_starting_canvas(size=None):
+    """
+    This function creates the start screen canvas (at size, or the current window size); the home scene draws
+    the song browser over its bottom quarter
     """
-    Any time the below code dictates that a note be pressed or released, this class is instantiated.
+    screen = open_canvas(size)
+    width, height = layout.current.size
+    pygame.display.set_caption("MIDI Home Page")
+    screen.fill((255, 255, 0))
+    scaled_background = asset_cache.image('Images/start_screen_new.png', (width, height * 3 // 4))
+    screen.blit(scaled_background, (0, 0))
+    interactive_background = asset_cache.image('Images/piano_preview.jpg', (width // 4, (height // 5)))
+    screen.blit(interactive_background, (int(width * 0.375), 0))
+    return screen
+
 
-    This Midi class also communicates with the KeyPress class to get x locations (to save code clutter on this page)
+def open_canvas(size=None):
     """
-    def __init__(self, note_location, delay_time, midi_file):
-        if type(note_location) == str:
-            note_location = note_location.split('note=')
-            self.note_location = KeyPress.KeyPress.get_location_x(int(note_location[1]) - 21)  # Gets location number of note 0-88
-        elif note_location is not None:
-            self.note_location = self.get_interactive_x(note_location, False)
-        if type(delay_time) == str:
-            delay_time = delay_time.split('time=')
-            self.delay_time = float(delay_time[1])  # Amount of "wait time" before the next note
-        self.midi_file = midi_file
+    This function opens the window at size (or the current size) and points the key lookups at its layout
+    """
+    screen = layout.set_mode(size)
+    asset_cache.set_budget(assets.budget_for(layout.current.size))
+    KeyPress.use_layout(layout.current)
+    return screen
 
-    def create_surface(self, screen, note_locations):  # Given a list of note locations, draw arrows at those locations
-        surface_width = CANVAS_WIDTH // TOTAL_PIANO_KEYS
-        if type(note_locations) == list:
-            for note_location_x in note_locations:
-                triangle_point1 = surface_width // 2, TOP_OF_KEYS - IMAGE_HEIGHT
-                triangle_point2 = 0, TOP_OF_KEYS - 20 - IMAGE_HEIGHT,
-                triangle_point3 = surface_width, TOP_OF_KEYS - 20 - IMAGE_HEIGHT
-
-                surface = (pygame.Surface([surface_width, TOP_OF_KEYS - IMAGE_HEIGHT]))
-                surface.fill(random.choice(Midi.get_color_set(self.midi_file)))
-                pygame.draw.polygon(surface, (0, 0, 0), (triangle_point1, triangle_point2, triangle_point3))
-                screen.blit(surface, (note_location_x, IMAGE_HEIGHT))
-
-    @staticmethod
-    def erase_surface(screen, note_locations):
-        surface_width = CANVAS_WIDTH // TOTAL_PIANO_KEYS
-        for note_location_x in note_locations:
-            surface = (pygame.Surface([surface_width, TOP_OF_KEYS - IMAGE_HEIGHT]))
-            surface.fill((255, 255, 255))
-            screen.blit(surface, (note_location_x, IMAGE_HEIGHT))
-
-    def get_interactive_x(self, location, black_key_option):
-        typical_formula = (CANVAS_WIDTH / PIANO_WHITE_KEYS) * int(location)
-
-        if black_key_option != "yes":
-            if (location - 4) % 7 == 0 or (location - 6) % 7 == 0 or location % 7 == 0:  # Note is E, G, A
-                return typical_formula - 3
-            return typical_formula
-        else:
-            if (location - 1) % 7 != 0 or (location - 4) % 7 != 0:  # 2, 3, 5, 6, 7
-                return typical_formula + 30
-
-    @staticmethod
-    def get_color_set(midi_file):
-        if midi_file == 'Music Midis/smbt.mid':
-            return mario_note_colors
-        elif midi_file == 'Music Midis/bloody.mid':
-            return bloody_note_colors
-        elif midi_file == 'Music Midis/Pianotris.mid':
-            return tetris_note_colors
-        elif midi_file == "Music Midis/wheel.mid":
-            return wheel_note_colors
-        elif midi_file == "Music Midis/Gravity-Falls-MIDI.mid":
-            return gravity_note_colors
-        else:
-            return interactive_piano_colors
+
+def make_lane(geometry, theme):
+    """
+    This function builds the arrow lane for the window's layout with the chosen compositor
+    """
+    lane_height = geometry.top_of_keys - geometry.image_height
+    if COMPOSITOR == 'array':
+        return compositor.ArrayLane(geometry.image_height, geometry.note_width, lane_height, theme, geometry.width,
+                                    geometry.key_x)
+    return renderer.ArrowLane(geometry.image_height, geometry.note_width, lane_height, theme)
 
 
-def main():
-    pygame.init()
+def make_highlighter(keyboard, theme, keys_surface, lowest_note):
+    """
+    This function builds the key highlighter for a keyboard with the chosen compositor
+    """
+    if COMPOSITOR == 'array':
+        return compositor.ArrayKeyHighlighter(keyboard, theme, keys_surface, lowest_note)
+    return renderer.KeyHighlighter(keyboard, theme, keys_surface, lowest_note)
+
+
+def warm_up_assets():
+    """
+    This function loads the fixed images and the keyboards into the asset cache ahead of time (needs the display
+    to be set up); song thumbnails and backgrounds are decoded in the background by the home screen browser
+    """
     create_starting_canvas()
-    pygame.display.update()
+    geometry = layout.current
+    asset_cache.image('Images/interactive_background.png', (geometry.width, geometry.top_of_keys))
+    piano_keyboard()
+    interactive_keyboard()
 
-    while True:
-        mouse_position = pygame.mouse.get_pos()
-        for event in pygame.event.get():  # Event loop required to keep PyGame window open on Mac
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if mouse_position[0] <= CANVAS_WIDTH * 0.2 and mouse_position[1] >= CANVAS_HEIGHT * 0.75:
-                    start_song(midi_files[0])  # Super Mario Bros
-                    main()
-                elif mouse_position[0] <= CANVAS_WIDTH * 0.4 and mouse_position[1] >= CANVAS_HEIGHT * 0.75:
-                    start_song(midi_files[1])  # Castlevania
-                    main()
-                elif mouse_position[0] <= CANVAS_WIDTH * 0.6 and mouse_position[1] >= CANVAS_HEIGHT * 0.75:
-                    start_song(midi_files[2])  # Gravity Falls
-                    main()
-                elif mouse_position[0] <= CANVAS_WIDTH * 0.8 and mouse_position[1] >= CANVAS_HEIGHT * 0.75:
-                    start_song(midi_files[3])  # Wheel of Fortune
-                    main()
-                elif mouse_position[0] > CANVAS_WIDTH * 0.8 and mouse_position[1] >= CANVAS_HEIGHT * 0.75:
-                    start_song(midi_files[4])  # Tetris
-                    main()
-                elif CANVAS_WIDTH * 2 // 5 <= mouse_position[0] <= CANVAS_WIDTH * 3 // 5 and CANVAS_HEIGHT // 4 >= mouse_position[1]:
-                    interactive()  # Interactive piano
-                    main()
-            if event.type == pygame.QUIT:
-                pygame.display.quit()
-                pygame.quit()
-                break
-
-
-def create_starting_canvas():
-    """
-    This function creates the start screen canvas
-    """
-    screen = pygame.display.set_mode((CANVAS_WIDTH, CANVAS_HEIGHT))
-    pygame.display.set_caption("MIDI Home Page")
-    screen.fill((255, 255, 0))
-    for i in range(len(preview_images)):
-        image_preview = pygame.image.load(preview_images[i]).convert()
-        scaled_preview = pygame.transform.scale(image_preview,
-                                                (CANVAS_WIDTH // len(preview_images), CANVAS_HEIGHT // 4))
-        screen.blit(scaled_preview, (int((CANVAS_WIDTH / len(preview_images)) * i), CANVAS_HEIGHT * 3 // 4))
-    background_setup = pygame.image.load('Images/start_screen_new.png')
-    scaled_background = pygame.transform.scale(background_setup, (CANVAS_WIDTH, CANVAS_HEIGHT * 3 // 4))
-    screen.blit(scaled_background, (0, 0))
-    interactive_preview = pygame.image.load('Images/piano_preview.jpg').convert()
-    interactive_background = pygame.transform.scale(interactive_preview,
-                                                    (CANVAS_WIDTH // 4, (CANVAS_HEIGHT // 5)))
-    screen.blit(interactive_background, (int(CANVAS_WIDTH * 0.375), 0))
-    return screen
 
+class SongScene(scenes.Scene):
+    """
+    This scene orchestrates the entire secondary display, and is entered if the user chooses a song.
+
+    Rehearsal keys (not available while a song is streaming):
+        R: switch between the arrow lane and the falling-notes piano roll
+        Left/Right: jump back/forward SEEK_STEP seconds
+        Up/Down: play faster/slower by RATE_STEP (audio is muted away from normal speed)
+        L: first press marks the loop start, second the loop end, third clears the loop
+    F3 shows or hides the performance overlay at any time.
+    """
+    can_stream = True  # Big uncached songs may be streamed instead of parsed up front
 
-def start_song(midi_file):
-    """
-    This function orchestrates the entire secondary display, and is run if the user chooses a song
-    """
-    music = mido.MidiFile(midi_file)  # creates human-readable file from MIDI for line-by-line classification
-    screen = create_music_canvas(midi_file)
-    draw_piano_keys(screen)
-    pygame.display.flip()
-    music_playing = False
-    while True:
-        for event in pygame.event.get():  # Event loop required to keep window open on Mac
-            if event.type == pygame.QUIT:
-                pygame.display.quit()
-                pygame.quit()
-                break
-        notes = []  # This holds the notes contained in each chord (notes added when time delay == 0)
-        for line in music:
-            read_music_line = str(line)
-            read_music_line = read_music_line.strip()
-            if "note=" in read_music_line and len(read_music_line) >= 5:  # Denotes a note being played or released
-                read_music_line = read_music_line.split(" ")
-                if read_music_line[4] != "time=0>":
-                    note_press = Midi(read_music_line[2], read_music_line[4], midi_file)
-                    if read_music_line[0] == "note_on" and read_music_line[3] != "velocity=0":
-                        if float(note_press.delay_time) == 0:  # Gets the notes to be played simultaneously
-                            notes.append(note_press.note_location)
-                        else:
-                            if music_playing is False:
-                                play_music(midi_file)
-                                music_playing = True
-                            notes.append(note_press.note_location)
-                            note_press.create_surface(screen, notes)
-                            pygame.display.update()
-                            staggered_sleep_time(midi_file, note_press)
-                    elif read_music_line[0] == "note_on" and read_music_line[3] == "velocity=0" or read_music_line[0] == "note_off":  # A note is released
-                        if float(note_press.delay_time) == 0:  # Get the notes to be removed simultaneously and erases them all at once
-                            notes.append(note_press.note_location)
-                        else:
-                            notes.append(note_press.note_location)
-                            Midi.erase_surface(screen, notes)
-                            keep_notes_visual = staggered_sleep_time(midi_file, note_press)
-                            pygame.display.update()
-                            notes = []
-            elif "control_change" in read_music_line:
-                read_music_line = str(line)
-                read_music_line = read_music_line.strip()
-                read_music_line = read_music_line.split(" ")
-                note_press = Midi(None, read_music_line[4], midi_file)
-                staggered_sleep_time(midi_file, note_press)
-        break
-
-
-def create_music_canvas(midi_file):
-    """
-    This function creates the canvas template that is used throughout the entire program
-    """
-    screen = pygame.display.set_mode((CANVAS_WIDTH, CANVAS_HEIGHT))
+    def __init__(self, midi_file, piano_roll=False):
+        self.midi_file = midi_file
+        self.theme = catalog.theme_for(midi_file)
+        self.show_piano_roll = piano_roll
+        self.screen = None
+        self.song = None
+        self.lane = None
+        self.highlighter = None
+        self.piano_roll = None
+        self.background = None  # Everything above the keys, kept to draw the piano roll over
+        self.clock = None
+        self.stream = None
+        self.note_index = None
+        self.density = None  # density.DensityProfile the level of detail is read from; None draws everything
+        self.loop_start = None
+        self.loop_end = None
+        self.audio = None
+        self.audio_render = None  # audio.BackgroundRender of a song played before it was in the audio cache
+        self.metrics = None
+        self.overlay = None
+        self.intro = None  # renderer.KeyboardIntro while the keys are being drawn; the song starts after it
+
+    def enter(self, manager):
+        super().enter(manager)
+        frames_kept = metrics.DUMPED_FRAMES if DUMP_METRICS else metrics.RECENT_FRAMES
+        self.metrics = metrics.Metrics(self.midi_file, frames_kept)
+        cache_misses = asset_cache.misses
+        load_start = time.perf_counter()
+        try:
+            music = timeline.cached_timeline(self.midi_file)
+            if music is None and self.can_stream and os.path.getsize(self.midi_file) >= STREAM_THRESHOLD:
+                self.stream = stream.EventStream(self.midi_file)  # decodes in the background while the keys are drawn
+                self.stream.start()
+            elif music is None:
+                music = timeline.load_timeline(self.midi_file)  # parses the whole file before anything is drawn
+            if music is not None and pygame.mixer.get_init():
+                if os.path.exists(audio.cache_path(self.midi_file, pygame.mixer.get_init()[0])):
+                    self.audio = audio.SongAudio(self.midi_file)
+                else:  # SDL_mixer plays the MIDI until the song is rendered, then update() moves over to its audio
+                    self.audio_render = audio.background_render(self.midi_file, pygame.mixer.get_init()[0])
+        except Exception as error:  # mido raises several different types for corrupt files
+            print("%s: cannot be played (%s: %s)" % (self.midi_file, type(error).__name__, error))
+            self.manager.switch(HomeScene())
+            return
+        self.metrics.once('load', time.perf_counter() - load_start)
+        self.song = music
+        if music is not None:
+            self.note_index = pianoroll.NoteIndex(music.notes)
+            self.density = density.DensityProfile(music.events, music.length)
+        self.draw_screen(intro=INTRO_ANIMATION)
+        self.metrics.count('surfaces', asset_cache.misses - cache_misses)
+        if self.stream is not None:
+            self.stream.wait_until_ready()
+            self.clock = stream.StreamingScheduler(self.stream)
+        else:
+            self.clock = scheduler.Scheduler(music.events, music.event_x)
+        self.clock.metrics = self.metrics
+        self.metrics.once('setup', time.perf_counter() - load_start)
+        if SHOW_METRICS:
+            pygame.display.update(self.overlay.toggle())
+        if self.intro is None:
+            self.start_playback()
+
+    def start_playback(self):
+        if self.audio is not None:
+            self.audio.play()
+            self.clock.start()
+            self.clock.lock(self.audio)  # Notes follow the samples being heard rather than a separate clock
+        else:
+            if pygame.mixer.get_init():
+                play_music(self.midi_file)  # Streamed and not yet rendered songs are played by SDL_mixer's MIDI synth
+            self.clock.start()
+
+    def use_rendered_audio(self):
+        """
+        Moves playback from SDL_mixer's MIDI synth to the song's audio once its background render is done
+        """
+        render, self.audio_render = self.audio_render, None
+        if render.path() is None:
+            print("%s: audio render failed, playing the MIDI instead" % self.midi_file)
+            return
+        self.audio = audio.SongAudio(self.midi_file)  # loading the WAV stops the MIDI
+        if self.clock.rate == 1.0:
+            self.audio.play(self.clock.position())
+        self.clock.lock(self.audio)
+
+    def draw_screen(self, size=None, intro=False):
+        """
+        Draws the song image and keyboard at the window size and builds the lane, overlay and piano roll for it;
+        with intro the keys are left to a KeyboardIntro that update() plays before the song starts
+        """
+        self.screen = create_music_canvas(self.midi_file, size)
+        geometry = layout.current
+        overlay_visible = self.overlay is not None and self.overlay.visible
+        self.overlay = metrics.Overlay(self.screen, self.metrics)
+        if intro:
+            self.intro = renderer.KeyboardIntro(geometry.piano, piano_keyboard(), INTRO_TIME)
+        else:
+            self.screen.blit(piano_keyboard(), (0, geometry.top_of_keys))
+        pygame.display.flip()
+        self.lane = make_lane(geometry, self.theme)
+        self.highlighter = make_highlighter(geometry.piano, self.theme, piano_keyboard(), timeline.LOWEST_PIANO_NOTE)
+        self.metrics.count('surfaces', self.lane.tile_count() + self.highlighter.sprite_count())
+        self.piano_roll = self.background = None
+        if self.show_piano_roll and self.song is not None:
+            self.show_piano_roll = False
+            self.toggle_piano_roll()
+        if overlay_visible:
+            pygame.display.update(self.overlay.toggle())
+
+    def resize(self, size):
+        if self.song is not None:
+            self.song = timeline.relayout(self.song)  # Same notes in the same order, only the x-locations move
+            self.clock.xs = self.song.event_x
+        self.draw_screen(size)
+        if self.intro is not None:  # The keys are all drawn at the new size already, so the song can start
+            self.intro = None
+            self.start_playback()
+        elif self.song is not None:  # Put the notes still held down back on the new lane and keyboard
+            self.show_sounding(self.clock.position())
+
+    def show_sounding(self, position):
+        """
+        Presses every note sounding at position on the keyboard (and the lane, unless the piano roll is shown)
+        """
+        rows = self.note_index.sounding(position)
+        notes = self.song.notes
+        keys = list(zip(self.song.note_x[rows].tolist(), notes['note'][rows].tolist(),
+                        notes['velocity'][rows].tolist()))
+        for x, note, velocity in keys:
+            self.highlighter.press(note, velocity)
+        dirty_rects = self.highlighter.draw(self.screen, time.perf_counter())
+        if not self.show_piano_roll:
+            self.lane.note_on(keys)
+            dirty_rects += self.lane.flush(self.screen)
+        pygame.display.update(dirty_rects)
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            pygame.display.update(self.overlay.toggle())
+        if event.type != pygame.KEYDOWN or self.song is None or self.intro is not None:
+            return
+        if event.key == pygame.K_r:
+            self.toggle_piano_roll()
+        elif event.key == pygame.K_LEFT:
+            self.seek(self.clock.position() - SEEK_STEP)
+        elif event.key == pygame.K_RIGHT:
+            self.seek(self.clock.position() + SEEK_STEP)
+        elif event.key == pygame.K_UP:
+            self.set_rate(min(self.clock.rate + RATE_STEP, MAX_RATE))
+        elif event.key == pygame.K_DOWN:
+            self.set_rate(max(self.clock.rate - RATE_STEP, MIN_RATE))
+        elif event.key == pygame.K_l:
+            if self.loop_start is None:
+                self.loop_start = self.clock.position()
+            elif self.loop_end is None and self.clock.position() > self.loop_start:
+                self.loop_end = self.clock.position()
+            else:
+                self.loop_start = self.loop_end = None
+
+    def seek(self, position):
+        position = min(max(position, 0.0), self.song.length)
+        self.clock.seek(position)
+        if self.clock.rate == 1.0 and self.audio is not None:
+            self.audio.play(position)
+        dirty_rects = self.highlighter.clear(self.screen)
+        if not self.show_piano_roll:  # The roll redraws itself every frame; the lane needs the held notes put back
+            dirty_rects.append(self.lane.clear(self.screen))
+        pygame.display.update(dirty_rects)
+        self.show_sounding(position)
+
+    def set_rate(self, rate):
+        self.clock.set_rate(rate)
+        if self.audio is None:
+            return
+        if rate == 1.0:
+            self.audio.play(self.clock.position())
+        else:
+            self.audio.stop()  # SDL_mixer cannot change the speed of a song
+
+    def toggle_piano_roll(self):
+        if self.piano_roll is None:
+            geometry = layout.current
+            roll_area = pygame.Rect(0, 0, geometry.width, geometry.top_of_keys)
+            self.background = self.screen.subsurface(roll_area).copy()
+            self.background.blit(self.overlay.background, self.overlay.rect)  # the roll's copy must not keep the overlay
+            self.metrics.count('surfaces')
+            self.piano_roll = pianoroll.PianoRoll(self.song, roll_area, geometry.note_width,
+                                                  self.theme, self.background,
+                                                  index=self.note_index)
+        self.show_piano_roll = not self.show_piano_roll
+        if not self.show_piano_roll:  # Back to arrows: clear the roll and re-draw the notes still held down
+            self.screen.blit(self.background, (0, 0))
+            pygame.display.update(self.piano_roll.area)
+            if self.clock is not None and self.clock.anchor is not None:
+                self.show_sounding(self.clock.position())
+
+    def update(self):
+        if self.intro is not None:
+            pygame.display.update(self.intro.draw(self.screen, time.perf_counter()))
+            if self.intro.finished():
+                self.intro = None
+                self.start_playback()
+            return
+        if self.audio_render is not None and self.audio_render.done():
+            self.use_rendered_audio()
+        if self.loop_end is not None and self.clock.position() >= self.loop_end:
+            self.seek(self.loop_start)
+        stage_start = time.perf_counter()
+        pressed, released = self.clock.due()  # Everything that changed since last frame is drawn together
+        scheduled = time.perf_counter()
+        position = self.clock.position()
+        level = density.FULL if self.density is None else self.density.level(position)
+        self.metrics.count(density.LEVEL_NAMES[level] + '_detail_frames')
+        self.highlighter.fade = level == density.FULL
+        if self.show_piano_roll:
+            dirty_rects = [self.piano_roll.draw(self.screen, position, level)]
+        else:
+            self.lane.note_off(released)
+            self.lane.note_on(pressed)
+            dirty_rects = self.lane.flush(self.screen, merge=level >= density.REDUCED)
+        moment = time.perf_counter()  # Fades run in real time whatever the playback rate
+        for x, note, velocity in released:
+            self.highlighter.release(note, moment)
+        for x, note, velocity in pressed:
+            self.highlighter.press(note, velocity)
+        dirty_rects += self.highlighter.draw(self.screen, moment)
+        dirty_rects += self.draw_panels()
+        drawn = time.perf_counter()
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+        self.metrics.add('schedule', scheduled - stage_start)
+        self.metrics.add('draw', drawn - scheduled)
+        self.metrics.add('display', time.perf_counter() - drawn)
+        if self.clock.finished():
+            report = self.clock.drift_report()
+            print("%s: %d events, mean drift %.1f ms, max drift %.1f ms, %d collapsed" % (
+                self.midi_file, report['events'], report['mean_drift'] * 1000, report['max_drift'] * 1000,
+                report['skipped']))
+            self.manager.switch(HomeScene())
+
+    def draw_panels(self):
+        """
+        Draws the panels shown over the song (the performance overlay); returns the rectangles to update
+        """
+        overlay_rect = self.overlay.draw(redraw=self.show_piano_roll)
+        return [] if overlay_rect is None else [overlay_rect]
+
+    def exit(self):
+        if pygame.mixer.get_init():
+            pygame.mixer.music.stop()
+        if self.stream is not None:
+            self.stream.stop()
+        if DUMP_METRICS and self.metrics is not None and self.metrics.frames:
+            print("%s: metrics written to %s" % (self.midi_file, self.metrics.dump()))
+        self.screen = self.song = self.lane = self.highlighter = self.piano_roll = self.background = self.clock = self.stream = self.note_index = self.density = None  # Drop the timeline and tiles as soon as the song is left
+        self.metrics = self.overlay = self.audio = self.audio_render = self.intro = None
+
+
+class PracticeScene(SongScene):
+    """
+    Song scene that scores the player along with the song: clicks on the keyboard, or the notes of a live MIDI
+    input (see live.py), are matched against the song's notes (see practice.py) and the score is shown in the
+    top-right corner. The rehearsal keys work as in the song scene; seeking or looping makes the notes from
+    there on expected again.
+    """
+    can_stream = False  # Scoring needs the whole timeline up front
+
+    def __init__(self, midi_file, source=None, piano_roll=False):
+        super().__init__(midi_file, piano_roll)
+        self.source = source
+        self.score = None
+        self.panel = None
+        self.presses = []  # (note, song seconds) of the presses since the last frame, scored once it is drawn
+
+    def enter(self, manager):
+        super().enter(manager)
+        if self.song is not None:  # None when the song could not be loaded and the scene is going home
+            self.score = practice.Score(self.song.notes)
+            self.panel.score = self.score
+
+    def start_playback(self):
+        super().start_playback()
+        if self.source is not None:
+            self.source.start()
+
+    def draw_screen(self, size=None, intro=False):
+        self.panel = None
+        super().draw_screen(size, intro)
+        self.panel = practice.ScorePanel(self.screen, self.metrics, self.score)
+        if self.score is not None:
+            self.score.changed = True
+
+    def toggle_piano_roll(self):
+        creating = self.piano_roll is None
+        super().toggle_piano_roll()
+        if self.panel is None:
+            return
+        if creating:  # the roll's copy of the background must not keep the panel either
+            self.background.blit(self.panel.background, self.panel.rect)
+        if not self.show_piano_roll:
+            pygame.display.update(self.panel.show())
+
+    def handle_event(self, event):
+        super().handle_event(event)
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and self.intro is None:
+            location = KeyPress.KeyPress(event.pos[0], event.pos[1]).piano_location()
+            if location is not None:
+                self.play(timeline.LOWEST_PIANO_NOTE + location, self.clock.position())
+
+    def play(self, note, moment):
+        if InteractiveScene.note_bank is not None:
+            InteractiveScene.note_bank.play(note)
+        self.presses.append((note, moment))
+
+    def seek(self, position):
+        super().seek(position)
+        self.presses.clear()  # made at the old song time
+        self.score.seek(position)
+
+    def update(self):
+        received = [] if self.source is None else self.source.drain()
+        if self.intro is None and received:
+            now = time.perf_counter()
+            position = self.clock.position()
+            for arrival, message in received:  # scored at the song time each note arrived, not this frame's
+                if message.type == 'note_on' and message.velocity > 0:
+                    self.play(message.note, position - (now - arrival) * self.clock.rate)
+        playing = self.intro is None
+        super().update()
+        if not playing:
+            return
+        scoring_start = time.perf_counter()  # The frame is on the display already
+        for note, moment in self.presses:
+            self.score.press(note, moment)
+        self.presses.clear()
+        self.score.expire(self.clock.position())
+        self.metrics.add('score', time.perf_counter() - scoring_start)
+
+    def draw_panels(self):
+        panel_rect = self.panel.draw(redraw=self.show_piano_roll)  # under the overlay where they meet
+        return ([] if panel_rect is None else [panel_rect]) + super().draw_panels()
+
+    def exit(self):
+        if self.score is not None:
+            if self.clock.finished():  # Notes at the very end are missed rather than left open
+                self.score.finish()
+            report = self.score.summary()
+            print("%s: %d of %d notes hit, %d missed, %d wrong (%.0f%%), mean timing %+.0f ms (%.0f ms off)" % (
+                self.midi_file, report['hits'], report['notes'], report['misses'], report['wrong'],
+                report['accuracy'] * 100, report['mean_offset'] * 1000, report['mean_abs_offset'] * 1000))
+        if self.source is not None:
+            self.source.close()
+        super().exit()
+        self.score = self.panel = None
+
+
+class LiveScene(scenes.Scene):
+    """
+    88-key display driven by a live MIDI input (see live.py); clicking above the keys returns to the home page
+    """
+    fps = LIVE_FPS
+
+    def __init__(self, source):
+        self.source = source
+        self.theme = themes.get()
+        self.screen = None
+        self.lane = None
+        self.highlighter = None
+        self.latency = live.LatencyMeter()
+
+    def enter(self, manager):
+        super().enter(manager)
+        self.resize(None)
+        self.source.start()
+
+    def resize(self, size):
+        self.screen = create_music_canvas(None, size)
+        geometry = layout.current
+        self.screen.blit(piano_keyboard(), (0, geometry.top_of_keys))
+        pygame.display.flip()
+        self.lane = make_lane(geometry, self.theme)
+        self.highlighter = make_highlighter(geometry.piano, self.theme, piano_keyboard(), timeline.LOWEST_PIANO_NOTE)
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN and event.pos[1] <= layout.current.top_of_keys:
+            self.manager.switch(HomeScene())
+
+    def update(self):
+        received = self.source.drain()
+        now = time.perf_counter()
+        for arrival, message in received:
+            x = KeyPress.KeyPress.get_location_x(message.note - timeline.LOWEST_PIANO_NOTE)
+            if message.type == 'note_on' and message.velocity > 0:
+                self.lane.note_on([(x, message.note, message.velocity)])
+                self.highlighter.press(message.note, message.velocity)
+                if InteractiveScene.note_bank is not None:
+                    InteractiveScene.note_bank.play(message.note)
+            else:
+                self.lane.note_off([(x, message.note, 0)])
+                self.highlighter.release(message.note, now)
+        dirty_rects = self.lane.flush(self.screen) + self.highlighter.draw(self.screen, now)
+        if dirty_rects:  # Released keys keep fading after the last message
+            pygame.display.update(dirty_rects)
+        if received:
+            self.latency.record([arrival for arrival, message in received], time.perf_counter())
+
+    def exit(self):
+        self.source.close()
+        report = self.latency.report()
+        print("%s: %d notes, input-to-pixel latency mean %.1f ms, p95 %.1f ms, max %.1f ms" % (
+            self.source.name, report['events'], report['mean'] * 1000, report['p95'] * 1000, report['max'] * 1000))
+        self.screen = self.lane = self.highlighter = None
+
+
+def create_music_canvas(midi_file, size=None):
+    """
+    This function creates the canvas template that is used throughout the entire program (at size, or the current window size)
+    """
+    screen = open_canvas(size)
     pygame.display.set_caption("MIDI Reader and Piano")
     screen.fill((255, 255, 255))
-    if midi_file is not None:
-        set_background_image(screen, midi_file)
+    song = None if midi_file is None else catalog.get().find(midi_file)
+    if song is not None and song.background is not None:
+        screen.blit(asset_cache.image(song.background, (layout.current.width, layout.current.image_height)), (0, 0))
     pygame.display.update()
     return screen
 
 
 def draw_piano_keys(screen):
     """
-    This function makes the piano key layout on the display
-    """
-    for i in range(PIANO_WHITE_KEYS + 1):
-        white_key_left = i * CANVAS_WIDTH // PIANO_WHITE_KEYS
-        white_key_top = TOP_OF_KEYS
-        white_key_width = CANVAS_WIDTH // PIANO_WHITE_KEYS
-        white_key_height = CANVAS_HEIGHT // 4
-
-        pygame.draw.line(screen, (0, 0, 0), (0, white_key_top), (CANVAS_WIDTH, white_key_top))
-        pygame.draw.rect(screen, (255, 255, 255), (white_key_left, white_key_top, white_key_width, white_key_height))
-        pygame.draw.line(screen, (0, 0, 0), (white_key_left, white_key_top), (white_key_left, CANVAS_HEIGHT))
-        pygame.display.flip()  # updating the display every loop iteration produces a cool drawing effect
-
-    for i in range(PIANO_WHITE_KEYS + 1):
-        white_key_left = i * CANVAS_WIDTH // PIANO_WHITE_KEYS
-        white_key_top = TOP_OF_KEYS
-        white_key_width = CANVAS_WIDTH // PIANO_WHITE_KEYS
-        white_key_height = CANVAS_HEIGHT // 4
-
-        black_key_width = int(white_key_width * (1 / 2))
-        black_key_height = int(white_key_height * 2 / 3)
-        black_key_left = (white_key_left + white_key_width - (black_key_width // 3))
-        black_key_top = white_key_top
-
-        if i == 0:  # Draw black keys
-            pygame.draw.rect(screen, (0, 0, 0), (black_key_left, black_key_top, black_key_width, black_key_height))
-        elif (i - 2) % 7 == 0:
-            for j in range(2):
-                pygame.draw.rect(screen, (0, 0, 0), (black_key_left + (white_key_width * j), black_key_top, black_key_width, black_key_height))
-                pygame.display.flip()
-            for j in range(3):
-                pygame.draw.rect(screen, (0, 0, 0), (black_key_left + (white_key_width * (j + 3)), black_key_top, black_key_width, black_key_height))
-                pygame.display.flip()
-
-
-def interactive():
-    screen = create_music_canvas(None)
-    draw_interactive_keys(screen)
-    pygame.display.flip()
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.MOUSEBUTTONDOWN and not pygame.mixer.get_busy():
-                mouse_position = pygame.mouse.get_pos()
-                note = KeyPress.KeyPress(mouse_position[0], mouse_position[1])
-                sound = note.play_note()
-                if sound is not None:
-                    pygame.mixer.music.load(sound)
-                    pygame.mixer.music.play()
-                elif mouse_position[1] <= CANVAS_HEIGHT * 3 // 4:
-                    main()
-            if event.type == pygame.QUIT:
-                pygame.display.quit()
-                pygame.quit()
-                break
+    This function makes the piano key layout on a surface (the intro animation is renderer.KeyboardIntro)
+    """
+    draw_keyboard(screen, layout.current.piano)
 
 
-def draw_interactive_keys(screen):
+def draw_keyboard(screen, keyboard):
     """
-    This function makes the interactive piano key layout on the display
+    This function draws a keyboard from the rectangles its layout computed for the window size
     """
+    width, height = screen.get_size()
+    for white_key in keyboard.white_rects:
+        pygame.draw.rect(screen, (255, 255, 255), white_key)
+        pygame.draw.line(screen, (0, 0, 0), white_key.topleft, (white_key.left, height))
+        pygame.draw.line(screen, (0, 0, 0), (0, keyboard.top), (width, keyboard.top))
+    for white_key, black_key in keyboard.black_keys:
+        pygame.draw.rect(screen, (0, 0, 0), black_key)
 
-    background_interactive = pygame.image.load('Images/interactive_background.png')
-    scaled_interactive = pygame.transform.scale(background_interactive, (CANVAS_WIDTH, TOP_OF_KEYS))
-    screen.blit(scaled_interactive, (0, 0))
 
-    for i in range(INTERACTIVE_WHITE_KEYS + 1):  # Draw white keys
-        white_key_left = i * CANVAS_WIDTH // INTERACTIVE_WHITE_KEYS
-        white_key_top = TOP_OF_KEYS
-        white_key_width = CANVAS_WIDTH // INTERACTIVE_WHITE_KEYS
-        white_key_height = CANVAS_HEIGHT // 4
-
-        pygame.draw.line(screen, (0, 0, 0), (0, white_key_top), (CANVAS_WIDTH, white_key_top))
-        pygame.draw.rect(screen, (255, 255, 255), (white_key_left, white_key_top, white_key_width, white_key_height))
-        pygame.draw.line(screen, (0, 0, 0), (white_key_left, white_key_top), (white_key_left, CANVAS_HEIGHT))
-
-    for i in range(INTERACTIVE_WHITE_KEYS + 1):  # Draw black keys
-        white_key_left = i * CANVAS_WIDTH // INTERACTIVE_WHITE_KEYS
-        white_key_top = TOP_OF_KEYS
-        white_key_width = CANVAS_WIDTH // INTERACTIVE_WHITE_KEYS
-        white_key_height = CANVAS_HEIGHT // 4
-
-        black_key_width = int(white_key_width * (1 / 2))
-        black_key_height = int(white_key_height * 2 / 3)
-        black_key_left = (white_key_left + white_key_width - (black_key_width // 3))
-        black_key_top = white_key_top
-        if i == 0:
-            pygame.draw.rect(screen, (0, 0, 0), (black_key_left, black_key_top, black_key_width, black_key_height))
-        elif (i - 2) % 7 == 0 and i < 20:
-            for j in range(2):
-                pygame.draw.rect(screen, (0, 0, 0), (
-                black_key_left + (white_key_width * j), black_key_top, black_key_width, black_key_height))
-            for j in range(3):
-                pygame.draw.rect(screen, (0, 0, 0), (
-                black_key_left + (white_key_width * (j + 3)), black_key_top, black_key_width, black_key_height))
-
-
-def staggered_sleep_time(midi_file, note_press):
-    """
-    Each song has a slightly different time delay when python loops over the lines of the file,
-    so these time delay optimizations keep each song in sync throughout its entire run time.
-    """
-
-    if midi_file == 'Music Midis/smbt.mid':
-        if float(note_press.delay_time) >= .0028:
-            time.sleep(float(note_press.delay_time) - .0028)
-            return float(note_press.delay_time) - .0028
-        else:
-            time.sleep(float(note_press.delay_time))
-            return float(note_press.delay_time)
+def piano_keyboard():
+    """
+    This function returns the pre-rendered 88-key keyboard for the window size, to be blitted at (0, top_of_keys)
+    """
+    return asset_cache.get(('piano_keyboard', layout.current.size),
+                           lambda: render_keyboard(draw_piano_keys))
 
-    elif midi_file == 'Music Midis/bloody.mid':
-        if float(note_press.delay_time) >= .0026:
-            time.sleep(float(note_press.delay_time) - .0026)
-            return float(note_press.delay_time) - .0026
-        else:
-            time.sleep(float(note_press.delay_time))
-            return float(note_press.delay_time)
 
-    elif midi_file == 'Music Midis/wheel.mid':
-        if float(note_press.delay_time) >= .0046:
-            time.sleep(float(note_press.delay_time) - .0046)
-            return float(note_press.delay_time) - .0046
-        else:
-            time.sleep(float(note_press.delay_time))
-            return float(note_press.delay_time)
+def interactive_keyboard():
+    """
+    This function returns the pre-rendered 36-key interactive keyboard for the window size, to be blitted at (0, top_of_keys)
+    """
+    return asset_cache.get(('interactive_keyboard', layout.current.size),
+                           lambda: render_keyboard(draw_interactive_key_shapes))
 
-    elif midi_file == 'Music Midis/Pianotris.mid':
-        if float(note_press.delay_time) >= .002:
-            time.sleep(float(note_press.delay_time) - .002)
-        else:
-            time.sleep(float(note_press.delay_time))
 
-    elif midi_file == 'Music Midis/Gravity-Falls-MIDI.mid':
-        if float(note_press.delay_time) >= .0045:
-            time.sleep(float(note_press.delay_time) - .0045)
-        else:
-            time.sleep(float(note_press.delay_time))
-
-
-
-def set_background_image(screen, midi_file):
-    """
-    This function sets the specific image to be displayed above the piano when the chosen song begins
-    """
-    if midi_file == "Music Midis/smbt.mid":
-        mario_image = pygame.image.load('Images/mario_project2.jpg')
-        scaled_mario = pygame.transform.scale(mario_image, (CANVAS_WIDTH, IMAGE_HEIGHT))
-        screen.blit(scaled_mario, (0, 0))
-    elif midi_file == "Music Midis/bloody.mid":
-        bloody_image = pygame.image.load('Images/bloody_image.jpg')
-        scaled_bloody = pygame.transform.scale(bloody_image, (CANVAS_WIDTH, IMAGE_HEIGHT))
-        screen.blit(scaled_bloody, (0, 0))
-    elif midi_file == "Music Midis/Pianotris.mid":
-        tetris_image = pygame.image.load('Images/tetris_contest.jpeg')
-        scaled_tetris = pygame.transform.scale(tetris_image, (CANVAS_WIDTH, IMAGE_HEIGHT))
-        screen.blit(scaled_tetris, (0, 0))
-    elif midi_file == "Music Midis/wheel.mid":
-        wheel_image = pygame.image.load('Images/wheel_image.jpg')
-        scaled_wheel = pygame.transform.scale(wheel_image, (CANVAS_WIDTH, IMAGE_HEIGHT))
-        screen.blit(scaled_wheel, (0, 0))
-    elif midi_file == "Music Midis/Gravity-Falls-MIDI.mid":
-        gravity_image = pygame.image.load('Images/gravity_background.jpeg')
-        scaled_gravity = pygame.transform.scale(gravity_image, (CANVAS_WIDTH, IMAGE_HEIGHT))
-        screen.blit(scaled_gravity, (0, 0))
-    return screen
+def render_keyboard(draw_keys):
+    geometry = layout.current
+    canvas = pygame.Surface(geometry.size).convert()
+    canvas.fill((255, 255, 255))
+    draw_keys(canvas)
+    return canvas.subsurface((0, geometry.top_of_keys, geometry.width, geometry.height - geometry.top_of_keys)).copy()
+
+
+class InteractiveScene(scenes.Scene):
+    """
+    Clickable 36-key piano; clicking anywhere above the keys returns to the home page, F3 toggles the overlay
+    """
+    note_bank = None  # All 88 piano notes, synthesized once at startup; the live and practice scenes play it too
+
+    def __init__(self):
+        self.metrics = metrics.Metrics('interactive')
+        self.theme = themes.get()
+        self.overlay = None
+        self.highlighter = None
+        self.held = None  # note lit by the mouse button being held down
+
+    @classmethod
+    def load_sounds(cls):
+        if cls.note_bank is None and pygame.mixer.get_init():
+            first_note = timeline.LOWEST_PIANO_NOTE  # The interactive piano's 36 keys are a part of the range
+            cls.note_bank = synth.NoteBank(range(first_note, first_note + layout.TOTAL_PIANO_KEYS))
+
+    def enter(self, manager):
+        super().enter(manager)
+        self.resize(None)
+        if SHOW_METRICS:
+            pygame.display.update(self.overlay.toggle())
+
+    def resize(self, size):
+        overlay_visible = self.overlay is not None and self.overlay.visible
+        screen = create_music_canvas(None, size)
+        draw_interactive_keys(screen)
+        pygame.display.flip()
+        self.highlighter = make_highlighter(layout.current.interactive, self.theme, interactive_keyboard(),
+                                            KeyPress.INTERACTIVE_LOWEST_NOTE)
+        self.held = None
+        self.overlay = metrics.Overlay(screen, self.metrics)
+        if overlay_visible:
+            pygame.display.update(self.overlay.toggle())
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            pygame.display.update(self.overlay.toggle())
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            mouse_position = event.pos
+            lookup_start = time.perf_counter()
+            note = KeyPress.KeyPress(mouse_position[0], mouse_position[1])
+            index = note.key_index()
+            looked_up = time.perf_counter()
+            self.metrics.add('hit_test', looked_up - lookup_start)
+            if index is not None:
+                self.held = KeyPress.INTERACTIVE_LOWEST_NOTE + index
+                self.highlighter.press(self.held, CLICK_VELOCITY)
+                if self.note_bank is not None:
+                    self.note_bank.play(self.held)
+                    self.metrics.add('play', time.perf_counter() - looked_up)
+            elif mouse_position[1] <= layout.current.top_of_keys:
+                self.manager.switch(HomeScene())
+        elif event.type == pygame.MOUSEBUTTONUP and self.held is not None:
+            self.highlighter.release(self.held, time.perf_counter())
+            self.held = None
+
+    def update(self):
+        dirty_rects = self.highlighter.draw(pygame.display.get_surface(), time.perf_counter())
+        overlay_rect = self.overlay.draw()
+        if overlay_rect is not None:
+            dirty_rects.append(overlay_rect)
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+
+    def exit(self):
+        self.overlay = self.highlighter = None
+
+
+def draw_interactive_keys(screen):
+    """
+    This function makes the interactive piano key layout on the display
+    """
+    geometry = layout.current
+    scaled_interactive = asset_cache.image('Images/interactive_background.png', (geometry.width, geometry.top_of_keys))
+    screen.blit(scaled_interactive, (0, 0))
+    screen.blit(interactive_keyboard(), (0, geometry.top_of_keys))
+
+
+def draw_interactive_key_shapes(screen):
+    """
+    This function draws the 36 interactive keys themselves, below the top of the keys
+    """
+    draw_keyboard(screen, layout.current.interactive)
 
 
 def play_music(file):
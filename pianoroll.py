@@ -0,0 +1,151 @@
+"""
+pianoroll.py
+
+Falling-notes (piano-roll) view of a song.
+
+Upcoming notes drop toward the keyboard and reach the top of the keys exactly at their onset. Each frame
+only asks a NoteIndex for the notes that overlap the visible time window, which is a binary search plus
+the handful of matches, so the cost of a frame does not grow with the length of the song.
+
+In dense passages the song scene asks for less detail (see density.py): notes lose their outlines, and at
+the lowest level the notes of each key that touch on screen are merged into one rectangle, so the number of
+draws per frame stays bounded however many notes are in view.
+"""
+import density
+import numpy as np
+import pygame
+
+LOOK_AHEAD = 3.0  # seconds of upcoming music shown above the keys
+OUTLINE_COLOR = (0, 0, 0)
+MERGE_GAP = 3  # pixels between two notes of a key that are still drawn as one rectangle at the lowest detail
+LONG_NOTE = 4.0  # notes held longer than this are found through time buckets instead of the onset search
+
+
+class NoteIndex:
+    """
+    Interval index over a timeline's notes.
+
+    Notes are sorted by onset, so every note of at most LONG_NOTE seconds that overlaps [start, end] has its
+    onset in [start - LONG_NOTE, end] and is found with two binary searches. Longer notes are listed in every
+    LONG_NOTE-second bucket of song time they overlap, so a query only reads the buckets its window touches,
+    however many sustained notes the song has.
+    """
+    def __init__(self, notes):
+        self.onset = np.asarray(notes['onset'])
+        self.offset = np.asarray(notes['offset'])
+        is_long = (self.offset - self.onset) > LONG_NOTE
+        self.short_rows = np.flatnonzero(~is_long)
+        self.short_onsets = self.onset[self.short_rows]
+        long_rows = np.flatnonzero(is_long)
+        first_bucket = (self.onset[long_rows] // LONG_NOTE).astype(np.int64)
+        spans = (self.offset[long_rows] // LONG_NOTE).astype(np.int64) - first_bucket + 1
+        entry_of = np.repeat(np.arange(len(long_rows)), spans)
+        step = np.arange(len(entry_of)) - np.repeat(np.cumsum(spans) - spans, spans)  # 0 in a note's first bucket
+        buckets = np.repeat(first_bucket, spans) + step
+        order = np.argsort(buckets, kind='stable')  # onset order is kept inside a bucket
+        self.bucket_rows = long_rows[entry_of[order]]
+        self.starts_here = step[order] == 0  # the note's onset falls in this bucket
+        bucket_count = int(buckets.max()) + 1 if len(buckets) else 0
+        self.bucket_starts = np.searchsorted(buckets[order], np.arange(bucket_count + 1), 'left')
+
+    def overlapping(self, start, end):
+        """
+        Output:
+            Row numbers of the notes sounding at any moment between start and end (seconds)
+        """
+        first = np.searchsorted(self.short_onsets, start - LONG_NOTE, 'left')
+        last = np.searchsorted(self.short_onsets, end, 'right')
+        rows = self.short_rows[first:last]
+        rows = rows[self.offset[rows] >= start]
+        low = max(int(start // LONG_NOTE), 0)
+        high = min(int(end // LONG_NOTE), len(self.bucket_starts) - 2)
+        if low <= high:
+            # Every long note in the first bucket, then only the ones that start in each later bucket (the others
+            # were already in the first)
+            middle = self.bucket_starts[low + 1]
+            later = np.arange(middle, self.bucket_starts[high + 1])
+            entries = np.concatenate((np.arange(self.bucket_starts[low], middle), later[self.starts_here[later]]))
+            long_rows = self.bucket_rows[entries]
+            long_rows = long_rows[(self.onset[long_rows] <= end) & (self.offset[long_rows] >= start)]
+            rows = np.concatenate((rows, long_rows))
+        return rows
+
+    def sounding(self, moment):
+        """
+        Output:
+            Row numbers of the notes held down at the given moment
+        """
+        rows = self.overlapping(moment, moment)
+        return rows[(self.onset[rows] <= moment) & (self.offset[rows] > moment)]
+
+
+class PianoRoll:
+    def __init__(self, song, area, note_width, theme, background, look_ahead=LOOK_AHEAD, index=None):
+        """
+        Given:
+            song: Timeline to display
+            area: pygame.Rect above the keyboard the notes fall through (its bottom is the top of the keys)
+            note_width: width of one falling note in pixels
+            theme: themes.Theme; each note is colored by its pitch and velocity
+            background: surface the size of area, redrawn under the notes every frame
+            index: NoteIndex of the song if one was already built
+        """
+        self.notes = song.notes
+        self.xs = song.note_x
+        self.index = NoteIndex(song.notes) if index is None else index
+        self.area = pygame.Rect(area)
+        self.note_width = note_width
+        self.palette = theme.notes
+        self.color_table = np.array(self.palette.index, dtype=np.int32)  # [velocity, pitch] -> color index
+        self.background = background
+        self.pixels_per_second = self.area.height / look_ahead
+        self.look_ahead = look_ahead
+
+    def draw(self, screen, moment, level=density.FULL):
+        """
+        Draws the window [moment, moment + look_ahead] at the given level of detail and returns the rectangle
+        to update
+        """
+        screen.blit(self.background, self.area.topleft)
+        rows = self.index.overlapping(moment, moment + self.look_ahead)
+        bottom = self.area.bottom
+        note_bottoms = np.minimum(bottom - (self.notes['onset'][rows] - moment) * self.pixels_per_second, bottom)
+        note_tops = np.maximum(bottom - (self.notes['offset'][rows] - moment) * self.pixels_per_second, self.area.top)
+        visible = note_bottoms - note_tops >= 1
+        rows = rows[visible]
+        tops = note_tops[visible].astype(np.int32)
+        heights = (note_bottoms[visible] - note_tops[visible]).astype(np.int32)
+        xs = self.xs[rows]
+        color_indices = self.color_table[self.notes['velocity'][rows], self.notes['note'][rows]]
+        if level >= density.MINIMAL:
+            xs, tops, heights, color_indices = self.merge_runs(xs, tops, heights, color_indices)
+        colors = self.palette.colors
+        for x, top, height, color_index in zip(xs.tolist(), tops.tolist(), heights.tolist(), color_indices.tolist()):
+            note_rect = (x, top, self.note_width, height)
+            screen.fill(colors[color_index], note_rect)
+            if level == density.FULL:
+                pygame.draw.rect(screen, OUTLINE_COLOR, note_rect, 1)
+        return self.area
+
+    def merge_runs(self, xs, tops, heights, color_indices):
+        """
+        Merges the notes of each key that overlap or are at most MERGE_GAP pixels apart into one rectangle
+        colored like its first note
+
+        Output:
+            (xs, tops, heights, color indices) of the merged rectangles
+        """
+        if len(xs) < 2:
+            return xs, tops, heights, color_indices
+        order = np.lexsort((tops, xs))
+        xs, tops, color_indices = xs[order], tops[order], color_indices[order]
+        bottoms = tops + heights[order]
+        # Offsetting each key by more than the screen height makes one running maximum cover every key at once
+        span = np.int64(self.area.bottom + MERGE_GAP + 1)
+        reach = np.maximum.accumulate(bottoms + xs * span)
+        starts = np.ones(len(xs), dtype=bool)
+        starts[1:] = (xs[1:] != xs[:-1]) | (tops[1:] + xs[1:] * span > reach[:-1] + MERGE_GAP)
+        firsts = np.flatnonzero(starts)
+        run_tops = tops[firsts]
+        run_bottoms = np.maximum.reduceat(bottoms, firsts)
+        return xs[firsts], run_tops, run_bottoms - run_tops, color_indices[firsts]
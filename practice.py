@@ -0,0 +1,185 @@
+"""
+practice.py
+
+Scoring for practice mode: the notes a player presses, matched against the notes the song expects.
+
+A press counts as a hit when an unscored note of the same pitch starts within TOLERANCE seconds of it,
+and as a wrong note otherwise. A note nobody pressed is missed once its window has closed. The expected
+onsets are grouped by pitch and sorted once when the song is loaded, so matching a press is one binary
+search in its pitch's onsets plus a look at the few onsets inside the window (O(log n)). Missed notes
+are found by a pointer that only moves forward through the notes in onset order.
+
+Presses are scored at the song time they were made (a MIDI message's arrival, not the frame that
+drained it), so how late a frame runs does not change the score. The song scene scores them after the
+frame has been drawn and handed to the display, which keeps scoring out of the render and audio path.
+"""
+import bisect
+import metrics
+import numpy as np
+import pygame
+
+TOLERANCE = 0.15  # seconds a press may be early or late and still hit a note
+PANEL_INTERVAL = 0.1  # seconds between re-renders of the score panel
+
+
+class OnsetIndex:
+    """
+    Expected onsets of a song grouped by pitch, with which notes have been scored (hit or missed) already
+    """
+    def __init__(self, notes, tolerance=TOLERANCE):
+        """
+        Given:
+            notes: timeline note array (onset, offset, note, ...) sorted by onset
+        """
+        self.tolerance = tolerance
+        order = np.lexsort((notes['onset'], notes['note']))  # by pitch, then by onset
+        self.onsets = notes['onset'][order].tolist()  # pitch p owns onsets[starts[p]:starts[p + 1]]
+        self.starts = np.searchsorted(notes['note'][order], np.arange(129), 'left').tolist()
+        self.slots = np.empty(len(order), dtype=np.int64)  # note row (onset order) -> its place in onsets
+        self.slots[order] = np.arange(len(order))
+        self.slots = self.slots.tolist()
+        self.times = notes['onset'].tolist()
+        self.scored = [False] * len(order)  # per place in onsets
+        self.expired = 0  # rows before this one have had their window close
+        self.reached = 0  # rows from this one on have not been scored yet
+
+    def __len__(self):
+        return len(self.times)
+
+    def match(self, note, moment):
+        """
+        Scores the unscored onset of note closest to moment (song seconds) within the tolerance
+
+        Output:
+            Seconds the press was late (negative when early), or None if no note was expected
+        """
+        if not 0 <= note < 128:
+            return None
+        stop = self.starts[note + 1]
+        best = None
+        for slot in range(bisect.bisect_left(self.onsets, moment - self.tolerance, self.starts[note], stop), stop):
+            onset = self.onsets[slot]
+            if onset > moment + self.tolerance:
+                break
+            if not self.scored[slot] and (best is None or abs(onset - moment) < abs(self.onsets[best] - moment)):
+                best = slot
+        if best is None:
+            return None
+        self.scored[best] = True
+        self.reached = max(self.reached, bisect.bisect_right(self.times, self.onsets[best]))
+        return moment - self.onsets[best]
+
+    def expire(self, position):
+        """
+        Output:
+            Number of notes whose window closed by position (song seconds) without a press
+        """
+        stop = bisect.bisect_left(self.times, position - self.tolerance)
+        missed = 0
+        for row in range(self.expired, stop):
+            slot = self.slots[row]
+            if not self.scored[slot]:
+                self.scored[slot] = True
+                missed += 1
+        self.expired = max(self.expired, stop)
+        self.reached = max(self.reached, self.expired)
+        return missed
+
+    def seek(self, position):
+        """
+        Makes every note whose window is still open at position expected again; notes skipped over are not missed
+        """
+        first = bisect.bisect_left(self.times, position - self.tolerance)
+        for row in range(first, self.reached):
+            self.scored[self.slots[row]] = False
+        self.expired = self.reached = first
+
+
+class Score:
+    def __init__(self, notes, tolerance=TOLERANCE):
+        self.index = OnsetIndex(notes, tolerance)
+        self.hits = 0
+        self.misses = 0
+        self.wrong = 0
+        self.offsets = []  # seconds each hit was late (negative when early)
+        self.last = None  # seconds the latest hit was late, or None after a wrong note
+        self.changed = True  # since the panel last showed the score
+
+    def press(self, note, moment):
+        """
+        Scores a press of note (MIDI number) made at moment (song seconds)
+        """
+        offset = self.index.match(note, moment)
+        if offset is None:
+            self.wrong += 1
+        else:
+            self.hits += 1
+            self.offsets.append(offset)
+        self.last = offset
+        self.changed = True
+
+    def expire(self, position):
+        missed = self.index.expire(position)
+        if missed:
+            self.misses += missed
+            self.changed = True
+
+    def seek(self, position):
+        self.index.seek(position)
+
+    def finish(self):
+        """
+        Closes the window of every note still expected, at the end of the song
+        """
+        self.expire(float('inf'))
+
+    def accuracy(self):
+        """
+        Output:
+            Hits as a share of every note expected so far and every wrong note (1.0 before anything was scored)
+        """
+        judged = self.hits + self.misses + self.wrong
+        return self.hits / judged if judged else 1.0
+
+    def summary(self):
+        """
+        Output:
+            Dictionary with the notes in the song, hits, misses, wrong notes, accuracy and the mean and mean absolute
+            timing of the hits in seconds
+        """
+        offsets = np.array(self.offsets)
+        return {
+            'notes': len(self.index),
+            'hits': self.hits,
+            'misses': self.misses,
+            'wrong': self.wrong,
+            'accuracy': self.accuracy(),
+            'mean_offset': float(offsets.mean()) if len(offsets) else 0.0,
+            'mean_abs_offset': float(np.abs(offsets).mean()) if len(offsets) else 0.0,
+        }
+
+
+class ScorePanel(metrics.Panel):
+    """
+    One line of score in the top-right corner, re-rendered only when the score changed and at most every
+    PANEL_INTERVAL. score is set by the scene once the song is loaded
+    """
+    interval = PANEL_INTERVAL
+
+    def __init__(self, screen, metrics, score=None, width=320, line_height=22):
+        rect = pygame.Rect(max(screen.get_width() - width, 0), 0, min(width, screen.get_width()), line_height)
+        super().__init__(screen, metrics, rect, line_height, line_height)
+        self.score = score
+
+    def changed(self):
+        return self.score is not None and self.score.changed
+
+    def text_lines(self):
+        score = self.score
+        score.changed = False
+        if score.last is None:
+            last = "wrong note" if score.wrong else ""
+        else:
+            last = "%+.0f ms" % (score.last * 1000)
+        return ["hit %d  missed %d  wrong %d  %.0f%%  %s" % (score.hits, score.misses, score.wrong,
+                                                            score.accuracy() * 100, last)]
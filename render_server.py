@@ -0,0 +1,228 @@
+"""
+render_server.py
+
+Headless render server: many song visualizations rendered at once, one per worker process.
+
+Each job names a MIDI file and optionally a theme, an output size, a frame rate and an output directory.
+Jobs are spread over a pool of worker processes. Every worker opens its own SDL dummy display once and
+then runs export.export_song for each job it is handed, so the workers share nothing and throughput
+grows with the number of cores. When every job is done, the server reports the time of each job and the
+total frames per second.
+
+Jobs come from MIDI files or folders given on the command line, or from a folder of JSON job files:
+
+    python render_server.py "Music Midis" --workers 4 --size 1280x720 --fps 30
+    python render_server.py --jobs render_jobs --watch
+
+A job file looks like {"midi": "Music Midis/smbt.mid", "theme": "tetris", "size": [1280, 720], "fps": 30}.
+Its result is written next to it as <name>.result.json, and job files that already have a result are
+skipped, so a folder can be fed while --watch keeps polling it. While watching, a job file that is not
+valid JSON yet and was modified within the last WRITE_GRACE seconds is taken to be still being written
+and is read again on the next pass. Writers that write elsewhere and rename the finished file into the
+folder never have a job read half-written.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+import os
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import export
+import library
+import pygame
+import themes
+
+OUTPUT_DIRECTORY = 'rendered'
+POLL_INTERVAL = 1.0  # seconds between looks at the job folder with --watch
+WRITE_GRACE = 5.0  # seconds since its last change a job file that is not valid JSON yet is given to be finished
+RESULT_SUFFIX = '.result.json'
+
+
+def make_job(midi_file, theme=None, size=None, fps=export.DEFAULT_FPS, raw=True, output_dir=None):
+    """
+    Output:
+        Job dictionary; output_dir defaults to a folder named after the song, size and frame rate
+    """
+    if output_dir is None:
+        name = os.path.splitext(os.path.basename(midi_file))[0]
+        if size is not None:
+            name += '-%dx%d' % tuple(size)
+        output_dir = os.path.join(OUTPUT_DIRECTORY, '%s-%dfps' % (name, fps))
+    return {'midi': midi_file, 'theme': theme, 'size': None if size is None else list(size), 'fps': fps,
+            'raw': raw, 'output': output_dir}
+
+
+def read_job_file(path, defaults):
+    """
+    Output:
+        Job from a JSON job file, with anything it leaves out taken from the defaults dictionary
+    """
+    with open(path) as job_file:
+        entry = json.load(job_file)
+    options = dict(defaults)
+    options.update({key: value for key, value in entry.items() if key != 'midi'})
+    job = make_job(entry['midi'], options.get('theme'), options.get('size'), options.get('fps', export.DEFAULT_FPS),
+                   options.get('raw', True), options.get('output'))
+    job['job_file'] = path
+    return job
+
+
+def pending_job_files(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.endswith('.json') and not name.endswith(RESULT_SUFFIX)
+                  and not os.path.exists(os.path.join(directory, name[:-len('.json')] + RESULT_SUFFIX)))
+
+
+def read_job_folder(directory, defaults, settle=0.0):
+    """
+    Given:
+        settle: seconds since its last change within which a job file that is not valid JSON is left for the
+                next call instead of failing (it may still be being written)
+    Output:
+        (jobs of every job file in directory without a result yet, error results of the job files that could not
+        be read)
+    """
+    jobs = []
+    failed = []
+    for path in pending_job_files(directory):
+        try:
+            jobs.append(read_job_file(path, defaults))
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            if isinstance(error, json.JSONDecodeError) and time.time() - os.path.getmtime(path) < settle:
+                continue  # probably still being written; read again on the next call
+            failed.append({'midi': None, 'job_file': path, 'error': "%s: %s" % (type(error).__name__, error)})
+            print_result(failed[-1])
+    return jobs, failed
+
+
+def init_worker():
+    """
+    Runs once in every worker process: opens the process's own dummy display
+    """
+    pygame.display.init()
+
+
+def render_job(job):
+    """
+    Worker: renders one job and returns it with its timings (or an 'error')
+    """
+    result = dict(job, worker=os.getpid())
+    started = time.perf_counter()
+    try:
+        if job['theme'] is not None and job['theme'] not in themes.themes:
+            raise ValueError("unknown theme %r" % job['theme'])
+        theme = None if job['theme'] is None else themes.get(job['theme'])
+        report = export.export_song(job['midi'], job['output'], job['fps'], job['raw'],
+                                    None if job['size'] is None else tuple(job['size']), theme)
+    except Exception as error:  # A broken song fails its own job, not the whole batch
+        result['error'] = "%s: %s" % (type(error).__name__, error)
+        result['seconds'] = time.perf_counter() - started
+        return result
+    result.update(report)
+    return result
+
+
+def write_result(result):
+    if 'job_file' in result:
+        with open(result['job_file'][:-len('.json')] + RESULT_SUFFIX, 'w') as result_file:
+            json.dump(result, result_file, indent=2)
+
+
+def render_jobs(jobs, workers=None, on_result=None):
+    """
+    Given:
+        jobs: list of job dictionaries (see make_job)
+        workers: number of processes (defaults to the number of CPU cores)
+        on_result: called in this process with each result as soon as its job finishes
+    Output:
+        (results in completion order, wall-clock seconds)
+    """
+    started = time.perf_counter()
+    results = []
+    if not jobs:
+        return results, 0.0
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        for finished in as_completed([pool.submit(render_job, job) for job in jobs]):
+            result = finished.result()
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+    return results, time.perf_counter() - started
+
+
+def throughput(results, seconds):
+    """
+    Output:
+        Dictionary with the jobs done and failed, frames rendered and frames per second over the whole run
+    """
+    done = [result for result in results if 'error' not in result]
+    frames = sum(result['frames'] for result in done)
+    return {'jobs': len(done), 'failed': len(results) - len(done), 'frames': frames, 'seconds': seconds,
+            'fps': frames / seconds if seconds else 0.0}
+
+
+def print_result(result):
+    write_result(result)
+    if 'error' in result:
+        print("failed: %s (%s)" % (result['midi'] or result['job_file'], result['error']))
+    else:
+        print("%s: %d frames in %.1f s (%.1f frames per second, worker %d)" % (
+            result['midi'], result['frames'], result['seconds'], result['fps'], result['worker']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render many song visualizations at once in worker processes")
+    parser.add_argument('songs', nargs='*', help="MIDI files or folders of MIDI files to render")
+    parser.add_argument('--jobs', metavar='FOLDER', help="folder of JSON job files")
+    parser.add_argument('--watch', action='store_true', help="keep polling the job folder for new jobs")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--size', type=export.parse_size, default=None, metavar='WIDTHxHEIGHT')
+    parser.add_argument('--fps', type=int, default=export.DEFAULT_FPS)
+    parser.add_argument('--theme', choices=sorted(themes.themes), default=None,
+                        help="color theme (default: each song's own)")
+    parser.add_argument('--png', action='store_true', help="write numbered PNG files instead of a raw RGB24 stream")
+    parser.add_argument('--report', metavar='FILE', help="also write every result and the totals as JSON")
+    args = parser.parse_args()
+    if not args.songs and args.jobs is None:
+        parser.error("give MIDI files, folders or --jobs")
+    if args.watch and args.jobs is None:
+        parser.error("--watch needs --jobs")
+
+    defaults = {'theme': args.theme, 'size': args.size, 'fps': args.fps, 'raw': not args.png}
+    jobs = []
+    failed = []  # job files that could not be read count as failed jobs in the totals
+    for song in args.songs:
+        for midi_file in library.find_midi_files(song) if os.path.isdir(song) else [song]:
+            jobs.append(make_job(midi_file, args.theme, args.size, args.fps, not args.png))
+    if args.jobs is not None:
+        folder_jobs, failed = read_job_folder(args.jobs, defaults, WRITE_GRACE if args.watch else 0.0)
+        jobs += folder_jobs
+
+    results, seconds = render_jobs(jobs, args.workers, print_result)
+    results = failed + results
+    while args.watch:
+        try:
+            time.sleep(POLL_INTERVAL)
+            jobs, failed = read_job_folder(args.jobs, defaults, WRITE_GRACE)
+            results += failed
+            if jobs:
+                more, more_seconds = render_jobs(jobs, args.workers, print_result)
+                results += more
+                seconds += more_seconds
+        except KeyboardInterrupt:
+            break
+
+    totals = throughput(results, seconds)
+    print("%d jobs (%d failed), %d frames in %.1f s: %.1f frames per second with %d workers" % (
+        totals['jobs'], totals['failed'], totals['frames'], totals['seconds'], totals['fps'],
+        args.workers or os.cpu_count()))
+    if args.report is not None:
+        with open(args.report, 'w') as report_file:
+            json.dump({'results': results, 'totals': totals}, report_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
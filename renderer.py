@@ -0,0 +1,236 @@
+"""
+renderer.py
+
+Frame-based drawing for the note-arrow lane that sits between the song image and the piano keys, and for
+the pressed keys lit up on the keyboard itself.
+
+Every arrow tile and every tint of a lit key is built once per song from the song's theme (themes.py), and
+presses and releases are queued as they come in. flush() / draw() apply everything that changed for the
+frame with plain blits and return only the rectangles that changed so the caller can hand them straight
+to pygame.display.update. A heavy chord is therefore a handful of blits, never a surface allocation.
+
+Both also follow the level of detail the song scene picks from its density profile (density.py): in dense
+passages the lane hands back one merged rectangle per frame and released keys skip their fade.
+"""
+import pygame
+
+ARROW_COLOR = (0, 0, 0)
+LANE_COLOR = (255, 255, 255)
+FADE_TIME = 0.3  # seconds a released key takes to fade back to its normal color
+FADE_STEPS = 6
+WHITE_KEY_COLOR = (255, 255, 255)
+BLACK_KEY_COLOR = (0, 0, 0)
+
+
+class ArrowLane:
+    def __init__(self, top, tile_width, tile_height, theme):
+        self.top = top
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.palette = theme.notes
+        self.arrow_tiles = [self.build_arrow_tile(color) for color in self.palette.colors]
+        self.erase_tile = pygame.Surface([tile_width, tile_height])
+        self.erase_tile.fill(LANE_COLOR)
+        self.pending = {}  # x-location -> arrow tile index, or None for a blank tile
+        self.shown = {}  # x-location -> arrow tile index on screen now; missing means blank
+
+    def build_arrow_tile(self, color):
+        """
+        Tile with the given background color and a black arrow pointing down at the key
+        """
+        triangle_point1 = self.tile_width // 2, self.tile_height
+        triangle_point2 = 0, self.tile_height - 20
+        triangle_point3 = self.tile_width, self.tile_height - 20
+
+        tile = pygame.Surface([self.tile_width, self.tile_height])
+        tile.fill(color)
+        pygame.draw.polygon(tile, ARROW_COLOR, (triangle_point1, triangle_point2, triangle_point3))
+        return tile
+
+    def tile_count(self):
+        return len(self.arrow_tiles) + 1
+
+    def note_on(self, keys):
+        """
+        keys: (x-location, note, velocity) of each pressed key
+        """
+        index = self.palette.index
+        for x, note, velocity in keys:
+            self.pending[x] = index[velocity][note]
+
+    def note_off(self, keys):
+        for x, note, velocity in keys:
+            self.pending[x] = None
+
+    def clear(self, screen):
+        """
+        Blanks the whole lane (after a seek) and returns the rectangle to update
+        """
+        self.pending.clear()
+        self.shown.clear()
+        return screen.fill(LANE_COLOR, (0, self.top, screen.get_width(), self.tile_height))
+
+    def flush(self, screen, merge=False):
+        """
+        Blits every tile queued since the last flush that changes what is on screen (a key pressed and
+        released within one frame is never drawn at all) and returns the rectangles that were touched, merged
+        into one if merge is set
+        """
+        dirty_rects = []
+        for x, tile_index in self.pending.items():
+            if self.shown.get(x) == tile_index:
+                continue
+            if tile_index is None:
+                del self.shown[x]
+                dirty_rects.append(screen.blit(self.erase_tile, (x, self.top)))
+            else:
+                self.shown[x] = tile_index
+                dirty_rects.append(screen.blit(self.arrow_tiles[tile_index], (x, self.top)))
+        self.pending.clear()
+        if merge and len(dirty_rects) > 1:
+            return [dirty_rects[0].unionall(dirty_rects[1:])]
+        return dirty_rects
+
+
+class KeyHighlighter:
+    """
+    Lights pressed keys on a keyboard in the theme's colors and fades them out after release
+    """
+    def __init__(self, keyboard, theme, keys_surface, lowest_note):
+        """
+        Given:
+            keyboard: layout.Keyboard the keys were drawn from
+            keys_surface: the pre-rendered keyboard, which is blitted back over a key once it has faded out
+            lowest_note: MIDI note number of the keyboard's first key
+        """
+        self.keyboard = keyboard
+        self.palette = theme.highlights
+        self.keys_surface = keys_surface
+        self.lowest_note = lowest_note
+        self.lit = {}  # key location -> [color index, release time or None, fade step on screen]
+        self.fade = True  # False turns released keys back to normal on the next draw
+        self.build_sprites()
+
+    def build_sprites(self):
+        self.sprites = {}  # (color index, black key) -> list of FADE_STEPS tiles from fully lit to almost unlit
+        for black, size in ((False, self.keyboard.highlight_rects[0].size), (True, self.black_size())):
+            for color_index in range(len(self.palette.colors)):
+                steps = []
+                for step in range(FADE_STEPS):
+                    sprite = pygame.Surface(size)
+                    sprite.fill(self.fade_color(color_index, black, step))
+                    steps.append(sprite)
+                self.sprites[(color_index, black)] = steps
+
+    def fade_color(self, color_index, black, step):
+        key_color = BLACK_KEY_COLOR if black else WHITE_KEY_COLOR
+        return blend(self.palette.colors[color_index], key_color, step / FADE_STEPS)
+
+    def black_size(self):
+        for black, rect in zip(self.keyboard.is_black, self.keyboard.highlight_rects):
+            if black:
+                return rect.size
+        return (1, 1)
+
+    def sprite_count(self):
+        return len(self.sprites) * FADE_STEPS
+
+    def press(self, note, velocity):
+        location = note - self.lowest_note
+        if 0 <= location < len(self.keyboard.highlight_rects):
+            self.lit[location] = [self.palette.index[velocity][note], None, None]
+
+    def release(self, note, now):
+        state = self.lit.get(note - self.lowest_note)
+        if state is not None and state[1] is None:
+            state[1] = now if self.fade else now - FADE_TIME
+
+    def advance(self, now):
+        """
+        Moves every lit key to its fade step at now
+
+        Output:
+            List of (key location, color index, step) for the keys whose step changed, step being None for the
+            keys that have faded out (and are no longer lit)
+        """
+        changes = []
+        for location, state in self.lit.items():
+            color_index, released_at, shown = state
+            step = 0 if released_at is None else int((now - released_at) / FADE_TIME * FADE_STEPS)
+            if step != shown:
+                state[2] = step
+                changes.append((location, color_index, step if step < FADE_STEPS else None))
+        for location, color_index, step in changes:
+            if step is None:
+                del self.lit[location]
+        return changes
+
+    def draw(self, screen, now):
+        """
+        Blits the keys whose fade step changed since the last call and returns the rectangles that were touched
+        """
+        dirty_rects = []
+        for location, color_index, step in self.advance(now):
+            rect = self.keyboard.highlight_rects[location]
+            if step is None:
+                dirty_rects.append(self.restore(screen, rect))
+            else:
+                sprite = self.sprites[(color_index, self.keyboard.is_black[location])][step]
+                dirty_rects.append(screen.blit(sprite, rect))
+        return dirty_rects
+
+    def clear(self, screen):
+        """
+        Puts every lit key back to normal (after a seek) and returns the rectangles that were touched
+        """
+        dirty_rects = [self.restore(screen, self.keyboard.highlight_rects[location]) for location in self.lit]
+        self.lit.clear()
+        return dirty_rects
+
+    def restore(self, screen, rect):
+        return screen.blit(self.keys_surface, rect, rect.move(0, -self.keyboard.top))
+
+
+class KeyboardIntro:
+    """
+    Timed intro effect that draws a keyboard key by key, white keys first, over duration seconds. Each draw()
+    adds the keys due by then, so the frame loop keeps handling events while it plays.
+    """
+    def __init__(self, keyboard, keys_surface, duration):
+        self.keyboard = keyboard
+        self.keys_surface = keys_surface
+        self.duration = duration
+        self.keys = [(False, rect) for rect in keyboard.white_rects] + [(True, rect) for white_key, rect in keyboard.black_keys]
+        self.shown = 0
+        self.started = None
+
+    def finished(self):
+        return self.shown == len(self.keys)
+
+    def draw(self, screen, now):
+        """
+        Draws the keys that are due and returns the rectangles that were touched; the last call blits the
+        finished keyboard
+        """
+        if self.started is None:
+            self.started = now
+        due = min(int((now - self.started) / self.duration * len(self.keys)) + 1, len(self.keys))
+        dirty_rects = []
+        for black, rect in self.keys[self.shown:due]:
+            if black:
+                dirty_rects.append(screen.blit(self.keys_surface, rect, rect.move(0, -self.keyboard.top)))
+            else:
+                dirty_rects.append(screen.fill(WHITE_KEY_COLOR, rect))
+                pygame.draw.line(screen, BLACK_KEY_COLOR, rect.topleft, rect.bottomleft)
+                pygame.draw.line(screen, BLACK_KEY_COLOR, rect.topleft, rect.topright)
+        self.shown = due
+        if self.finished():
+            dirty_rects.append(screen.blit(self.keys_surface, (0, self.keyboard.top)))
+        return dirty_rects
+
+
+def blend(color, other, amount):
+    """
+    color moved amount (0-1) of the way toward other
+    """
+    return tuple(int(channel + (other_channel - channel) * amount) for channel, other_channel in zip(color, other))
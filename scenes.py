@@ -0,0 +1,106 @@
+"""
+scenes.py
+
+Scene manager that owns the one pygame event loop for the whole program.
+
+Each screen (home page, song playback, interactive piano) is a Scene. The manager enters one scene at a
+time, forwards events to it, lets it draw once per frame and calls its exit hook before the next scene is
+entered. Switching screens therefore never nests loops or grows the call stack. Window resizes and the
+F11 full screen switch are handled here too and passed to the scene's resize hook once per frame.
+"""
+import layout
+import pygame
+import time
+
+
+class Scene:
+    """
+    Base class for a screen; subclasses override whichever hooks they need
+    """
+    fps = None  # Frame rate while this scene is active; None uses the manager's
+    metrics = None  # metrics.Metrics the manager records each frame's event, update and sleep times into
+
+    def enter(self, manager):
+        """
+        Called once when the scene becomes active; set up the display here
+        """
+        self.manager = manager
+
+    def exit(self):
+        """
+        Called once when the scene is replaced or the program quits; release anything large here
+        """
+
+    def handle_event(self, event):
+        """
+        Called for every pygame event except QUIT
+        """
+
+    def update(self):
+        """
+        Called once per frame after the events have been handled
+        """
+
+    def resize(self, size):
+        """
+        Called after the window changed size (or switched to or from full screen); redraw everything here
+        """
+
+
+class SceneManager:
+    def __init__(self, fps):
+        self.fps = fps
+        self.scene = None
+        self.next_scene = None
+        self.running = False
+        self.clock = pygame.time.Clock()
+
+    def switch(self, scene):
+        """
+        Replaces the current scene at the start of the next frame
+        """
+        self.next_scene = scene
+
+    def quit(self):
+        self.running = False
+
+    def run(self, first_scene):
+        self.switch(first_scene)
+        self.running = True
+        while self.running:
+            if self.next_scene is not None:
+                if self.scene is not None:
+                    self.scene.exit()
+                self.scene, self.next_scene = self.next_scene, None
+                self.scene.enter(self)
+                continue  # A scene may switch again straight from enter()
+            frame_start = time.perf_counter()
+            resized = None
+            for event in pygame.event.get():  # Event loop required to keep PyGame window open on Mac
+                if event.type == pygame.QUIT:
+                    self.quit()
+                    break
+                if event.type == pygame.VIDEORESIZE:
+                    resized = event.size  # A drag sends many; only the last size of the frame is laid out
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F11:
+                    resized = layout.toggle_fullscreen().get_size()
+                else:
+                    self.scene.handle_event(event)
+            if resized is not None and self.running and self.next_scene is None:
+                self.scene.resize(resized)
+            events_done = time.perf_counter()
+            if self.running and self.next_scene is None:
+                self.scene.update()
+            update_done = time.perf_counter()
+            self.clock.tick(self.scene.fps or self.fps)
+            metrics = self.scene.metrics
+            if metrics is not None:
+                metrics.add('events', events_done - frame_start)
+                metrics.add('update', update_done - events_done)
+                metrics.add('sleep', time.perf_counter() - update_done)
+                metrics.end_frame(time.perf_counter() - frame_start)
+        if self.scene is not None:
+            self.scene.exit()
+            self.scene = None
+        pygame.display.quit()
+        pygame.quit()
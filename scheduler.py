@@ -0,0 +1,129 @@
+"""
+scheduler.py
+
+Drives note events from one monotonic clock.
+
+The clock is anchored to the moment the song's audio starts, and every event fires at its absolute
+timestamp from the timeline instead of after a chain of relative sleeps. When the display falls
+behind, all overdue events are handed back at once and collapsed, so it catches up on the next pass
+rather than drifting. The lag of every fired event is kept so the drift of each song can be reported.
+
+The clock can also be moved: seek() jumps to any song time with a binary search over the event times,
+and set_rate() plays faster or slower than written without losing the current position.
+
+When the song's audio can report its own position (audio.SongAudio), lock() makes the clock read that
+position directly while playing at normal speed, so the notes follow the samples actually being heard.
+"""
+import numpy as np
+import time
+
+
+class Scheduler:
+    def __init__(self, events, xs=None):
+        self.events = events  # None for subclasses that supply events another way
+        self.times = events['time'] if events is not None else None
+        self.xs = xs  # x-location of every event (Timeline.event_x)
+        self.next_event = 0
+        self.anchor = None
+        self.anchor_position = 0.0  # song time at the anchor
+        self.rate = 1.0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.fired = 0
+        self.skipped = 0
+        self.metrics = None  # metrics.Metrics that receives the lag of every fired event, if set
+        self.audio = None  # anything with a position() method returning song seconds (or None), see lock()
+
+    def start(self, anchor=None):
+        """
+        Anchors the clock; call this right after the audio starts playing
+        """
+        self.anchor = time.perf_counter() if anchor is None else anchor
+
+    def lock(self, audio):
+        """
+        Follows audio.position() whenever it reports one and the rate is 1.0; the monotonic clock covers the rest
+        """
+        self.audio = audio
+
+    def position(self):
+        """
+        Current song time in seconds
+        """
+        if self.audio is not None and self.rate == 1.0:
+            position = self.audio.position()
+            if position is not None:
+                return position
+        return self.anchor_position + (time.perf_counter() - self.anchor) * self.rate
+
+    def seek(self, position):
+        """
+        Moves the clock to position (seconds); the next due() starts from the first event at or after it
+        """
+        self.anchor_position = max(position, 0.0)
+        self.anchor = time.perf_counter()
+        self.next_event = int(np.searchsorted(self.times, self.anchor_position, 'left'))
+
+    def set_rate(self, rate):
+        """
+        Changes the playback speed (1.0 is as written) from the current position on
+        """
+        self.anchor_position = self.position()
+        self.anchor = time.perf_counter()
+        self.rate = rate
+
+    def finished(self):
+        return self.next_event >= len(self.events)
+
+    def due(self, now=None):
+        """
+        Output:
+            (pressed, released) lists of (x-location, note, velocity) for the keys whose state changed since the last call
+
+        Called once per frame. Every event whose timestamp has passed is consumed; if a key is pressed and
+        released within the same frame only its final state is kept, which is how a late frame skips ahead.
+        now overrides the clock with an explicit song time, for rendering without real-time playback.
+        """
+        if now is None:
+            now = self.position()
+        start = self.next_event
+        stop = max(int(np.searchsorted(self.times, now, 'right')), start)
+        if stop == start:
+            return [], []
+        self.next_event = stop
+
+        batch = self.events[start:stop]
+        return self.collapse(now, batch['time'].tolist(), self.xs[start:stop].tolist(), batch['on'].tolist(),
+                             batch['note'].tolist(), batch['velocity'].tolist())
+
+    def collapse(self, now, times, xs, ons, notes, velocities):
+        """
+        Records the lag of a batch of fired events and reduces it to the final state of each key
+        """
+        for event_time in times:
+            lag = now - event_time
+            self.lag_total += lag
+            self.lag_max = max(self.lag_max, lag)
+            if self.metrics is not None:
+                self.metrics.lag(lag)
+        self.fired += len(times)
+
+        key_states = {}  # x-location -> (pressed, note, velocity), the last event for a key wins
+        for x, on, note, velocity in zip(xs, ons, notes, velocities):
+            key_states[x] = (on, note, velocity)
+        self.skipped += len(xs) - len(key_states)
+        pressed = [(x, note, velocity) for x, (on, note, velocity) in key_states.items() if on]
+        released = [(x, note, velocity) for x, (on, note, velocity) in key_states.items() if not on]
+        return pressed, released
+
+    def drift_report(self):
+        """
+        Output:
+            Dictionary with the mean and max lag (seconds) of fired events and how many were collapsed
+        """
+        return {
+            'events': self.fired,
+            'mean_drift': self.lag_total / self.fired if self.fired else 0.0,
+            'max_drift': self.lag_max,
+            'skipped': self.skipped,
+        }
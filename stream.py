@@ -0,0 +1,218 @@
+"""
+stream.py
+
+Streaming playback for songs that have not been turned into a timeline yet.
+
+A producer thread pushes timed note events into a bounded buffer while the renderer consumes them frame
+by frame. Playback starts as soon as the first PRE_ROLL seconds of events are buffered, and the buffer
+never holds more than BUFFER_EVENTS events however long the song is.
+
+The producer does not hand the file to mido, which decodes every track into messages and merges them into
+one sorted list before the first event comes out. Instead each track chunk is decoded lazily from the
+file's bytes, only note and tempo messages are kept, and the tracks are merged in tick order with
+heapq.merge while a running tempo turns ticks into seconds. Memory stays at the size of the file, and the
+first events are ready after a few bytes of every track have been read.
+"""
+import heapq
+import KeyPress
+import queue
+import scheduler
+import struct
+import tempo
+import threading
+import timeline
+
+BUFFER_EVENTS = 4096
+PRE_ROLL = 0.3  # seconds of song that must be buffered before playback starts
+PUT_TIMEOUT = 0.1  # how often a blocked producer checks whether it has been stopped
+
+END_OF_SONG = None
+SET_TEMPO = 0xff  # kind of a tempo change in track_events; notes keep their status nibble (0x80 or 0x90)
+
+
+def read_variable_int(data, position):
+    """
+    Output:
+        (value, position after it) of the variable-length quantity at position
+    """
+    value = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value = (value << 7) | (byte & 0x7f)
+        if byte < 0x80:
+            return value, position
+
+
+def data_length(status):
+    """
+    Output:
+        Number of data bytes that follow a channel or system status byte
+    """
+    if 0xc0 <= status < 0xe0 or status == 0xf1 or status == 0xf3:
+        return 1
+    if status < 0xf0 or status == 0xf2:
+        return 2
+    return 0
+
+
+def read_chunks(data):
+    """
+    Output:
+        (ticks per beat, [(start, end) byte range of every track chunk]) from a standard MIDI file's bytes
+    """
+    if data[:4] != b'MThd':
+        raise OSError("MThd not found. Probably not a MIDI file")
+    header_size = int.from_bytes(data[4:8], 'big')
+    file_type, track_count, ticks_per_beat = struct.unpack('>hhh', data[8:14])
+    if file_type == 2:
+        raise ValueError("type 2 (asynchronous) MIDI files are not supported")
+    tracks = []
+    position = 8 + header_size
+    for _ in range(track_count):
+        if data[position:position + 4] != b'MTrk':
+            raise OSError("no MTrk header at start of track")
+        size = int.from_bytes(data[position + 4:position + 8], 'big')
+        tracks.append((position + 8, position + 8 + size))
+        position += 8 + size
+    return ticks_per_beat, tracks
+
+
+def track_events(data, start, end):
+    """
+    Yields (tick, kind, note or tempo, velocity) for the note and tempo messages of one track chunk, decoding
+    them from the bytes as they are asked for (running status and skipped messages are handled as mido does)
+    """
+    tick = 0
+    position = start
+    last_status = None
+    while position < end:
+        delta, position = read_variable_int(data, position)
+        tick += delta
+        status = data[position]
+        if status < 0x80:
+            if last_status is None:
+                raise OSError("running status without last_status")
+            status = last_status
+        else:
+            position += 1
+            if status != 0xff:  # Meta messages don't set running status
+                last_status = status
+        if status == 0xff:
+            meta_type = data[position]
+            length, position = read_variable_int(data, position + 1)
+            if meta_type == 0x51 and length == 3:
+                yield tick, SET_TEMPO, int.from_bytes(data[position:position + 3], 'big'), 0
+            position += length
+        elif status == 0xf0 or status == 0xf7:
+            length, position = read_variable_int(data, position)
+            position += length
+        else:
+            kind = status & 0xf0
+            if kind == 0x80 or kind == 0x90:
+                yield tick, kind, data[position], data[position + 1]
+            position += data_length(status)
+
+
+class EventStream:
+    """
+    Producer thread plus bounded buffer of (time, on, note, velocity) events
+    """
+    def __init__(self, midi_file, capacity=BUFFER_EVENTS, pre_roll=PRE_ROLL):
+        self.midi_file = midi_file
+        self.pre_roll = pre_roll
+        self.buffer = queue.Queue(maxsize=capacity)
+        self.error = None
+        self.stopping = threading.Event()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self.produce, name="midi-stream", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join()
+
+    def wait_until_ready(self):
+        """
+        Blocks until pre_roll seconds of events are buffered, the buffer is full or the song has ended
+        """
+        self.ready.wait()
+
+    def produce(self):
+        try:
+            with open(self.midi_file, 'rb') as song_file:
+                data = song_file.read()
+            ticks_per_beat, tracks = read_chunks(data)
+            change_tick, change_seconds = 0, 0.0  # the latest tempo change, as tempo.TempoMap keeps them
+            seconds_per_tick = tempo.DEFAULT_TEMPO / (1e6 * ticks_per_beat)
+            # Ties keep track order, like the stable sort mido merges tracks with
+            merged = heapq.merge(*[track_events(data, start, end) for start, end in tracks], key=lambda event: event[0])
+            for tick, kind, value, velocity in merged:
+                now = change_seconds + (tick - change_tick) * seconds_per_tick
+                if kind == SET_TEMPO:
+                    change_tick, change_seconds = tick, now
+                    seconds_per_tick = value / (1e6 * ticks_per_beat)
+                    continue
+                if not self.put((now, kind == 0x90 and velocity > 0, value, velocity)):
+                    return
+                if now >= self.pre_roll or self.buffer.full():
+                    self.ready.set()
+        except Exception as error:  # A broken file ends the song instead of hanging the renderer
+            self.error = error
+        self.put(END_OF_SONG)
+        self.ready.set()
+
+    def put(self, event):
+        """
+        Waits for room in the buffer; returns False if the stream was stopped meanwhile
+        """
+        while not self.stopping.is_set():
+            try:
+                self.buffer.put(event, timeout=PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+
+class StreamingScheduler(scheduler.Scheduler):
+    """
+    Scheduler that pulls its events from an EventStream instead of a whole timeline
+    """
+    def __init__(self, stream):
+        super().__init__(None)
+        self.stream = stream
+        self.upcoming = None  # first event that is not due yet
+        self.ended = False
+
+    def finished(self):
+        return self.ended
+
+    def due(self, now=None):
+        if now is None:
+            now = self.position()
+        times, xs, ons, notes, velocities = [], [], [], [], []
+        while True:
+            event = self.upcoming
+            if event is None:
+                try:
+                    event = self.stream.buffer.get_nowait()
+                except queue.Empty:
+                    break  # The producer is behind; whatever is missing is picked up next frame
+                if event is END_OF_SONG:
+                    self.ended = True
+                    break
+            if event[0] > now:
+                self.upcoming = event
+                break
+            self.upcoming = None
+            times.append(event[0])
+            ons.append(event[1])
+            xs.append(KeyPress.KeyPress.get_location_x(event[2] - timeline.LOWEST_PIANO_NOTE))  # current window size
+            notes.append(event[2])
+            velocities.append(event[3])
+        if not times:
+            return [], []
+        return self.collapse(now, times, xs, ons, notes, velocities)
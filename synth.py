@@ -0,0 +1,109 @@
+"""
+synth.py
+
+Small built-in NumPy piano synth.
+
+Notes are rendered to PCM once (a few decaying harmonics with a short attack) and wrapped in
+pygame.mixer.Sound objects, so playing a note is just starting a buffer on a free mixer channel:
+no file is opened and no MIDI synth is restarted, and several notes can sound at once.
+render_song() uses the same tones to render a whole song from its timeline (see audio.py).
+"""
+import numpy as np
+import pygame
+
+SAMPLE_RATE = 44100
+MIXER_BUFFER = 256  # samples per mixer callback; small keeps key-to-sound latency in single-digit ms
+CHANNEL_POOL = 32  # notes that can ring at the same time before the oldest is cut off
+
+NOTE_DURATION = 1.5  # seconds
+ATTACK = 0.005  # seconds
+DECAY = 2.5  # larger values die away faster
+HARMONICS = [(1, 1.0), (2, 0.45), (3, 0.2), (4, 0.1)]  # (multiple of the fundamental, relative loudness)
+VOLUME = 0.3
+MAX_SONG_NOTE = 6.0  # seconds; a note held longer than this has decayed to silence in a rendered song
+RELEASE = 0.05  # seconds a rendered song note takes to fade out after its key is released
+
+
+def pre_init():
+    """
+    Asks for a low-latency mixer; must be called before pygame.init()
+    """
+    pygame.mixer.pre_init(SAMPLE_RATE, -16, 2, MIXER_BUFFER)
+
+
+def note_frequency(note):
+    return 440.0 * 2 ** ((note - 69) / 12)
+
+
+def render_note(note, duration=NOTE_DURATION, sample_rate=SAMPLE_RATE):
+    """
+    Given:
+        note: MIDI note number
+    Output:
+        Mono float32 samples in [-1, 1]
+    """
+    t = np.arange(int(duration * sample_rate), dtype=np.float32) / sample_rate
+    frequency = note_frequency(note)
+    samples = np.zeros_like(t)
+    for multiple, loudness in HARMONICS:
+        if frequency * multiple < sample_rate / 2:  # Skip harmonics that would alias
+            samples += loudness * np.sin(2 * np.pi * frequency * multiple * t)
+    envelope = np.minimum(t / ATTACK, 1.0) * np.exp(-DECAY * t)
+    envelope[-int(0.01 * sample_rate):] *= np.linspace(1.0, 0.0, int(0.01 * sample_rate))  # No click at the end
+    return samples * envelope / sum(loudness for multiple, loudness in HARMONICS)
+
+
+def render_song(notes, length, sample_rate=SAMPLE_RATE):
+    """
+    Given:
+        notes: timeline note array (onset, offset, note, velocity)
+        length: song length in seconds
+    Output:
+        Mono float32 samples in [-1, 1] for the whole song, sample 0 being song time 0
+    """
+    release = int(RELEASE * sample_rate)
+    samples = np.zeros(int(length * sample_rate) + release + 1, dtype=np.float32)
+    starts = np.round(notes['onset'] * sample_rate).astype(np.int64)
+    held = np.round((notes['offset'] - notes['onset']) * sample_rate).astype(np.int64)
+    fade = np.linspace(1.0, 0.0, release, dtype=np.float32)
+    waves = {}  # one long tone per pitch, cut to length for every note of that pitch
+    for pitch in np.unique(notes['note']).tolist():
+        waves[pitch] = render_note(pitch, MAX_SONG_NOTE, sample_rate).astype(np.float32)
+    for start, duration, pitch, velocity in zip(starts.tolist(), held.tolist(), notes['note'].tolist(),
+                                                notes['velocity'].tolist()):
+        wave = waves[pitch]
+        end = min(duration + release, len(wave), len(samples) - start)
+        tone = wave[:end] * (velocity / 127)
+        if end > duration:  # The key was let go before the tone died away: fade it out over RELEASE
+            tone[duration:end] *= fade[:end - duration]
+        samples[start:start + end] += tone
+    peak = np.abs(samples).max() if len(samples) else 0.0
+    if peak > 1.0:
+        samples /= peak
+    return samples
+
+
+def to_sound(samples):
+    """
+    Converts float samples to a pygame.mixer.Sound in the mixer's own format
+    """
+    frequency, size, channels = pygame.mixer.get_init()
+    pcm = (np.clip(samples, -1.0, 1.0) * VOLUME * 32767).astype(np.int16)
+    if channels > 1:
+        pcm = np.repeat(pcm[:, None], channels, axis=1)
+    return pygame.sndarray.make_sound(np.ascontiguousarray(pcm))
+
+
+class NoteBank:
+    """
+    Pre-rendered sounds for a set of MIDI notes, played on a shared pool of mixer channels
+    """
+    def __init__(self, notes, channels=CHANNEL_POOL):
+        sample_rate = pygame.mixer.get_init()[0]
+        self.sounds = {note: to_sound(render_note(note, sample_rate=sample_rate)) for note in notes}
+        pygame.mixer.set_num_channels(channels)
+
+    def play(self, note):
+        sound = self.sounds.get(note)
+        if sound is not None:
+            pygame.mixer.find_channel(True).play(sound)  # True steals the oldest channel when all are busy
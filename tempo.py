@@ -0,0 +1,46 @@
+"""
+tempo.py
+
+Tempo map for converting MIDI ticks to seconds.
+
+Every set_tempo meta message in every track is collected into one sorted list of tempo changes with the
+number of seconds elapsed at each change. Any tick position (or a whole array of them) is then turned
+into seconds with one binary search instead of walking the song from the start.
+"""
+import numpy as np
+
+DEFAULT_TEMPO = 500000  # microseconds per beat (120 bpm) until the first set_tempo
+
+
+class TempoMap:
+    def __init__(self, music):
+        """
+        Given:
+            music: mido.MidiFile (type 0 or 1; in both, tempo changes in any track apply to the whole song)
+        """
+        if music.type == 2:
+            raise ValueError("type 2 (asynchronous) MIDI files are not supported")
+        self.ticks_per_beat = music.ticks_per_beat
+        changes = {0: DEFAULT_TEMPO}
+        for track in music.tracks:
+            tick = 0
+            for message in track:
+                tick += message.time
+                if message.type == 'set_tempo':
+                    changes[tick] = message.tempo  # The last change at a tick wins, as in mido's merged order
+        self.change_ticks = np.array(sorted(changes), dtype=np.int64)
+        self.tempos = np.array([changes[tick] for tick in self.change_ticks], dtype=np.float64)
+        seconds_per_tick = self.tempos / (1e6 * self.ticks_per_beat)
+        self.change_seconds = np.concatenate(([0.0], np.cumsum(np.diff(self.change_ticks) * seconds_per_tick[:-1])))
+        self.seconds_per_tick = seconds_per_tick
+
+    def to_seconds(self, ticks):
+        """
+        Given:
+            ticks: absolute tick position, or an array of them
+        Output:
+            Seconds from the start of the song
+        """
+        ticks = np.asarray(ticks, dtype=np.int64)
+        segment = np.searchsorted(self.change_ticks, ticks, 'right') - 1
+        return self.change_seconds[segment] + (ticks - self.change_ticks[segment]) * self.seconds_per_tick[segment]
@@ -0,0 +1,29 @@
+"""
+conftest.py
+
+Puts the program's modules (which live at the top of the repository) on the import path, keeps SDL off any
+real display or sound device, and builds the note arrays the tests feed the program.
+"""
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+import timeline
+
+
+@pytest.fixture
+def make_notes():
+    """
+    Function turning (onset, offset, note) tuples into a timeline note array sorted by onset, at velocity 64
+    """
+    def build(rows):
+        notes = np.zeros(len(rows), dtype=timeline.NOTE_DTYPE)
+        for row, (onset, offset, note) in enumerate(sorted(rows, key=lambda entry: entry[0])):
+            notes[row] = (onset, offset, note, 64)
+        return notes
+    return build
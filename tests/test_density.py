@@ -0,0 +1,43 @@
+"""
+test_density.py
+
+Levels of detail picked from the event rate and the number of notes held.
+"""
+import density
+import numpy as np
+import timeline
+
+
+def make_song(make_notes, spans, length):
+    return timeline.Timeline(make_notes([(onset, offset, 60) for onset, offset in spans]), length)
+
+
+def test_sparse_song_is_drawn_in_full(make_notes):
+    song = make_song(make_notes, [(second, second + 0.5) for second in range(10)], 10.0)
+    profile = density.DensityProfile(song.events, song.length)
+    assert {profile.level(position) for position in np.arange(0.0, 10.0, 0.1)} == {density.FULL}
+
+
+def test_dense_burst_drops_detail_one_window_early(make_notes):
+    burst = [(10.0 + i * 0.001, 10.0 + i * 0.001 + 0.01) for i in range(200)]  # 400 events in 0.2 s
+    song = make_song(make_notes, [(1.0, 1.5)] + burst, 20.0)
+    profile = density.DensityProfile(song.events, song.length)
+    assert profile.level(10.1) == density.MINIMAL
+    assert profile.level(10.0 - density.WINDOW / 2) == density.MINIMAL  # the window before the burst
+    assert profile.level(10.0 - density.WINDOW * 1.5) == density.FULL
+    assert profile.level(15.0) == density.FULL
+
+
+def test_held_notes_count_in_windows_without_events(make_notes):
+    chord = [(1.0, 3.0)] * density.REDUCED_POLYPHONY
+    song = make_song(make_notes, chord, 5.0)
+    profile = density.DensityProfile(song.events, song.length)
+    assert profile.polyphony[int(2.0 / density.WINDOW)] == density.REDUCED_POLYPHONY
+    assert profile.level(2.0) == density.REDUCED
+    assert profile.level(4.0) == density.FULL
+
+
+def test_level_clamps_positions_outside_the_song(make_notes):
+    song = make_song(make_notes, [(0.0, 1.0)], 1.0)
+    profile = density.DensityProfile(song.events, song.length)
+    assert profile.level(-5.0) == profile.level(1e9) == density.FULL
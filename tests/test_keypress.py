@@ -0,0 +1,69 @@
+"""
+test_keypress.py
+
+Click lookup at the edges of white and black keys, on both keyboards and at a few window sizes.
+"""
+import KeyPress
+import layout
+import pytest
+
+SIZES = [layout.DEFAULT_SIZE, layout.MIN_SIZE, (1920, 1080), (1333, 777)]
+
+
+def keyboards(screen_layout):
+    return [(screen_layout.piano, layout.white_key_locations),
+            (screen_layout.interactive, KeyPress.interactive_white_notes)]
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_every_key_is_hit_inside_its_lit_area(size):
+    screen_layout = layout.Layout(*size)
+    for keyboard, white_notes in keyboards(screen_layout):
+        table = KeyPress.HitTable(screen_layout, keyboard, white_notes)
+        for location, rect in enumerate(keyboard.highlight_rects):
+            right = min(rect.right, screen_layout.width) - 1  # the last black key can hang off the window
+            assert table.lookup(rect.left, rect.top) == location
+            assert table.lookup(right, rect.bottom - 1) == location
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_black_key_edges(size):
+    screen_layout = layout.Layout(*size)
+    for keyboard, white_notes in keyboards(screen_layout):
+        table = KeyPress.HitTable(screen_layout, keyboard, white_notes)
+        bottom = keyboard.top + keyboard.black_height
+        below = screen_layout.height - 1
+        for white_key, rect in keyboard.black_keys:
+            black = white_notes[white_key] + 1
+            assert keyboard.is_black[black]
+            right = min(rect.right, screen_layout.width) - 1
+            for x in (rect.left, right):
+                assert table.lookup(x, keyboard.top) == black
+                assert table.lookup(x, bottom - 1) == black
+                assert table.lookup(x, bottom) == table.lookup(x, below)  # the white key under it
+                assert not keyboard.is_black[table.lookup(x, bottom)]
+            # Just outside a black key is the white key drawn there (rounding can leave either neighbour there)
+            for x in (rect.left - 1, right + 1):
+                if x < screen_layout.width:
+                    assert table.lookup(x, keyboard.top) == table.lookup(x, below)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_white_key_edges(size):
+    screen_layout = layout.Layout(*size)
+    for keyboard, white_notes in keyboards(screen_layout):
+        table = KeyPress.HitTable(screen_layout, keyboard, white_notes)
+        y = screen_layout.height - 1  # below the black keys
+        for i in range(keyboard.white_keys):
+            assert table.lookup(keyboard.white_rects[i].left, y) == white_notes[i]
+            assert table.lookup(keyboard.white_rects[i + 1].left - 1, y) == white_notes[i]
+        assert table.lookup(screen_layout.width - 1, y) == white_notes[-1]  # columns left over by the key width
+
+
+def test_outside_the_keys():
+    screen_layout = layout.Layout(*layout.DEFAULT_SIZE)
+    table = KeyPress.HitTable(screen_layout, screen_layout.piano, layout.white_key_locations)
+    assert table.lookup(10, screen_layout.piano.top - 1) is None
+    assert table.lookup(-1, screen_layout.height - 1) is None
+    assert table.lookup(screen_layout.width, screen_layout.height - 1) is None
+    assert table.lookup(10, screen_layout.height) is None
@@ -0,0 +1,49 @@
+"""
+test_pianoroll.py
+
+NoteIndex queries against a brute-force scan, with notes around the LONG_NOTE length and windows on the
+edges of its time buckets.
+"""
+import numpy as np
+import pianoroll
+
+LONG_NOTE = pianoroll.LONG_NOTE
+
+
+def brute_force(notes, start, end):
+    return set(np.flatnonzero((notes['onset'] <= end) & (notes['offset'] >= start)).tolist())
+
+
+def test_notes_at_the_long_note_length(make_notes):
+    notes = make_notes([(0.0, LONG_NOTE, 60),  # exactly LONG_NOTE: found by the onset search
+                        (0.5, 0.5 + LONG_NOTE + 0.01, 62),  # just longer: found through the buckets
+                        (1.0, 3 * LONG_NOTE, 64),  # spans three buckets
+                        (LONG_NOTE, 2 * LONG_NOTE + 1.0, 65)])  # starts on a bucket edge
+    index = pianoroll.NoteIndex(notes)
+    assert list(index.short_rows) == [0]
+    windows = [(LONG_NOTE, LONG_NOTE), (LONG_NOTE - 0.01, LONG_NOTE - 0.01), (0.5 + LONG_NOTE, 2 * LONG_NOTE),
+               (2 * LONG_NOTE, 2 * LONG_NOTE), (2.5 * LONG_NOTE, 2.5 * LONG_NOTE), (3 * LONG_NOTE, 10 * LONG_NOTE),
+               (-1.0, 0.0), (0.0, 100.0)]
+    for start, end in windows:
+        found = index.overlapping(start, end).tolist()
+        assert len(found) == len(set(found)), (start, end)  # a long note in several buckets is listed once
+        assert set(found) == brute_force(notes, start, end), (start, end)
+
+
+def test_sounding_excludes_notes_ending_at_the_moment(make_notes):
+    index = pianoroll.NoteIndex(make_notes([(0.0, LONG_NOTE, 60), (1.0, LONG_NOTE + 2.0, 62)]))
+    assert index.sounding(LONG_NOTE).tolist() == [1]
+    assert sorted(index.sounding(1.0).tolist()) == [0, 1]
+
+
+def test_random_windows_match_brute_force(make_notes):
+    generator = np.random.default_rng(13)
+    onsets = np.round(generator.uniform(0, 60, 400) * 4) / 4  # many onsets on bucket edges
+    lengths = generator.choice([0.1, 1.0, LONG_NOTE - 0.25, LONG_NOTE, LONG_NOTE + 0.25, 9.0, 25.0], len(onsets))
+    notes = make_notes([(onset, onset + length, 60) for onset, length in zip(onsets, lengths)])
+    index = pianoroll.NoteIndex(notes)
+    for start in np.arange(-2.0, 70.0, 0.5):
+        for window in (0.0, 0.5, LONG_NOTE, 3.0 * LONG_NOTE):
+            found = index.overlapping(start, start + window).tolist()
+            assert len(found) == len(set(found))
+            assert set(found) == brute_force(notes, start, start + window)
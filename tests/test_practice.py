@@ -0,0 +1,65 @@
+"""
+test_practice.py
+
+Matching presses against a song's notes, closing the windows of missed notes, and seeking.
+"""
+import practice
+import pytest
+
+TOLERANCE = practice.TOLERANCE
+
+
+def make_score(make_notes, onsets_and_notes):
+    return practice.Score(make_notes([(onset, onset + 0.5, note) for onset, note in onsets_and_notes]))
+
+
+def test_press_hits_the_closest_unscored_note(make_notes):
+    score = make_score(make_notes, [(1.0, 60), (1.2, 60), (1.0, 64)])
+    score.press(60, 1.15)  # nearer the note at 1.2
+    assert score.last == pytest.approx(-0.05)
+    score.press(60, 1.15)  # that one is taken, so the note at 1.0 is hit
+    assert score.last == pytest.approx(0.15)
+    score.press(60, 1.15)  # nothing left to hit
+    assert (score.hits, score.wrong, score.last) == (2, 1, None)
+
+
+def test_press_outside_the_tolerance_is_wrong(make_notes):
+    score = make_score(make_notes, [(1.0, 60)])
+    score.press(60, 1.0 + TOLERANCE + 0.01)
+    score.press(62, 1.0)
+    assert (score.hits, score.wrong) == (0, 2)
+
+
+def test_expire_misses_a_note_once_its_window_closes(make_notes):
+    score = make_score(make_notes, [(1.0, 60), (2.0, 62)])
+    score.expire(1.0 + TOLERANCE - 0.01)
+    assert score.misses == 0
+    score.expire(1.0 + TOLERANCE + 0.01)
+    assert score.misses == 1
+    score.expire(1.5)  # a note is only missed once
+    assert score.misses == 1
+    score.press(62, 2.05)
+    score.finish()
+    assert (score.hits, score.misses) == (1, 1)
+
+
+def test_seek_back_makes_notes_expected_again(make_notes):
+    score = make_score(make_notes, [(1.0, 60), (2.0, 62), (3.0, 64)])
+    score.press(60, 1.0)
+    score.press(62, 2.0)
+    score.expire(3.5)
+    assert (score.hits, score.misses) == (2, 1)
+    score.seek(1.5)
+    score.press(62, 2.0)  # hit again after the seek, as in a loop
+    score.press(60, 1.0)  # before the seek position: already scored
+    assert (score.hits, score.wrong) == (3, 1)
+    score.expire(3.5)
+    assert score.misses == 2
+
+
+def test_seek_forward_does_not_miss_the_notes_skipped(make_notes):
+    score = make_score(make_notes, [(1.0, 60), (2.0, 62), (3.0, 64)])
+    score.seek(2.5)
+    score.press(64, 3.0)
+    score.finish()
+    assert (score.hits, score.misses, score.wrong) == (1, 0, 0)
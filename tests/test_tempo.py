@@ -0,0 +1,62 @@
+"""
+test_tempo.py
+
+TempoMap against hand-computed times and against mido's own tick-to-second conversion.
+"""
+import mido
+import numpy as np
+import pytest
+import tempo
+
+
+def song_with_tempo_changes():
+    """
+    Type 1 song at 480 ticks per beat: 120 bpm, 240 bpm from tick 960 (set in the first track) and 60 bpm from
+    tick 1920 (set in the second track, which still applies to the whole song)
+    """
+    music = mido.MidiFile(type=1, ticks_per_beat=480)
+    conductor = mido.MidiTrack([mido.MetaMessage('set_tempo', tempo=250000, time=960)])
+    timed = [(1920, mido.MetaMessage('set_tempo', tempo=1000000))]
+    for tick in range(0, 2880, 240):
+        timed += [(tick, mido.Message('note_on', note=60, velocity=64)),
+                  (tick + 120, mido.Message('note_off', note=60, velocity=0))]
+    notes = mido.MidiTrack()
+    previous = 0
+    for tick, message in sorted(timed, key=lambda entry: entry[0]):
+        notes.append(message.copy(time=tick - previous))
+        previous = tick
+    music.tracks += [conductor, notes]
+    return music
+
+
+def test_times_across_tempo_changes():
+    tempo_map = tempo.TempoMap(song_with_tempo_changes())
+    assert tempo_map.to_seconds(0) == 0.0
+    assert tempo_map.to_seconds(480) == pytest.approx(0.5)
+    assert tempo_map.to_seconds(960) == pytest.approx(1.0)  # the change itself
+    assert tempo_map.to_seconds(1440) == pytest.approx(1.25)
+    assert tempo_map.to_seconds(1920) == pytest.approx(1.5)
+    assert tempo_map.to_seconds(2400) == pytest.approx(2.5)
+    assert np.allclose(tempo_map.to_seconds(np.array([480, 1440, 2400])), [0.5, 1.25, 2.5])
+
+
+def test_matches_mido():
+    music = song_with_tempo_changes()
+    tempo_map = tempo.TempoMap(music)
+    seconds = 0.0
+    ticks = 0
+    expected = []
+    for message in music:  # mido merges the tracks and converts delta times with every tempo change
+        seconds += message.time
+        if message.type == 'note_on':
+            expected.append(seconds)
+    for message in mido.merge_tracks(music.tracks):
+        ticks += message.time
+        if message.type == 'note_on':
+            assert tempo_map.to_seconds(ticks) == pytest.approx(expected.pop(0))
+    assert not expected
+
+
+def test_type_2_is_refused():
+    with pytest.raises(ValueError):
+        tempo.TempoMap(mido.MidiFile(type=2))
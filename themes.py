@@ -0,0 +1,79 @@
+"""
+themes.py
+
+Color themes, named by the songs' catalog manifests (see catalog.py).
+
+A Theme turns a song's palette into a fixed list of colors and a lookup table from (velocity, pitch) to
+an index into that list, built once when the theme is created. The palette color is picked by pitch and
+tinted by how hard the note was played (soft notes are paler), so the same note always gets the same
+color and drawing code only ever does a table lookup. The renderers build one pre-tinted sprite per color
+index up front (see renderer.py).
+"""
+VELOCITY_LEVELS = 4  # tints per palette color, from softest to hardest
+SOFTEST_TINT = 0.55  # how far the softest level is blended toward white
+
+# Below are the color schemes for the themed songs
+mario_note_colors = [(248, 222, 126), (255, 0, 0), (0, 255, 0), (0, 0, 255), (101, 67, 33)]
+bloody_note_colors = [(255, 90, 54), (178, 34, 34), (220, 220, 220), (100, 100, 100), (200, 200, 200), (255, 255, 0)]
+tetris_note_colors = [(255, 50, 19), (3, 65, 174), (114, 203, 59), (255, 213, 0), (255, 151, 28)]
+wheel_note_colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 105, 180), (255, 69, 0), (255, 255, 0)]
+gravity_note_colors = [(0, 128, 128), (255, 42, 4), (0, 0, 200), (0, 255, 0)]
+interactive_piano_colors = [(255, 255, 255)]
+interactive_highlight_colors = [(90, 150, 255)]  # white arrows would not show up on white keys
+
+
+def velocity_level(velocity):
+    return min(velocity * VELOCITY_LEVELS // 128, VELOCITY_LEVELS - 1)
+
+
+def tint(color, level):
+    """
+    Blends color toward white for the softer velocity levels
+    """
+    paleness = SOFTEST_TINT * (1 - level / (VELOCITY_LEVELS - 1))
+    return tuple(int(channel + (255 - channel) * paleness) for channel in color)
+
+
+class Palette:
+    """
+    Tinted colors of one palette and the (velocity, pitch) -> color index table
+    """
+    def __init__(self, colors):
+        self.colors = [tint(color, level) for color in colors for level in range(VELOCITY_LEVELS)]
+        self.index = [[(pitch % len(colors)) * VELOCITY_LEVELS + velocity_level(velocity) for pitch in range(128)]
+                      for velocity in range(128)]  # index[velocity][pitch]
+
+    def color(self, velocity, pitch):
+        return self.colors[self.index[velocity][pitch]]
+
+
+class Theme:
+    def __init__(self, name, note_colors, highlight_colors=None):
+        """
+        Given:
+            note_colors: palette for the arrow tiles and falling notes
+            highlight_colors: palette for lit keys on the keyboard (the note palette if None)
+        """
+        self.name = name
+        self.notes = Palette(note_colors)
+        self.highlights = Palette(highlight_colors or note_colors)
+
+
+themes = {
+    'mario': Theme('mario', mario_note_colors),
+    'castlevania': Theme('castlevania', bloody_note_colors),
+    'tetris': Theme('tetris', tetris_note_colors),
+    'wheel': Theme('wheel', wheel_note_colors),
+    'gravity': Theme('gravity', gravity_note_colors),
+    'interactive': Theme('interactive', interactive_piano_colors, interactive_highlight_colors),
+}
+
+DEFAULT_THEME = 'interactive'
+
+
+def get(name=None):
+    """
+    Output:
+        The named Theme, or the plain interactive theme for no name (or a name that is not defined)
+    """
+    return themes.get(name, themes[DEFAULT_THEME])
@@ -0,0 +1,231 @@
+"""
+timeline.py
+
+Loading stage for the music displayer.
+
+A MIDI file is read once, before playback starts, and turned into a compact
+array-backed timeline: one row per note (onset, offset, note, velocity) and
+one row per note on/off event in playback order. The playback loop only reads
+from these arrays, so no message parsing happens between notes.
+
+The display x-location of every note and event depends on the window size, so it is kept apart in two
+int32 arrays (note_x, event_x) filled from the note column with one table lookup.
+
+Parsed timelines are also kept in an on-disk cache of .npy files keyed by the MIDI file's content hash
+and the parser version, so a song that was played before starts without being parsed again. Cached
+arrays are memory-mapped rather than read: only the x arrays are built when an entry is loaded, and the
+other columns are paged in as playback reaches them, so one entry serves every window size and the start
+time hardly depends on the length of the song.
+"""
+from io import BytesIO
+import hashlib
+import json
+import KeyPress
+import mido
+import numpy as np
+import os
+import tempfile
+import tempo
+
+LOWEST_PIANO_NOTE = 21  # MIDI number of the lowest key (A0) on an 88-key piano
+
+PARSER_VERSION = 3  # Bump whenever build_timeline's output changes so old cache entries are ignored
+CACHE_DIRECTORY = '.timeline_cache'
+
+NOTE_DTYPE = np.dtype([('onset', 'f8'), ('offset', 'f8'), ('note', 'u1'), ('velocity', 'u1')])
+EVENT_DTYPE = np.dtype([('time', 'f8'), ('on', '?'), ('note', 'u1'), ('velocity', 'u1')])
+
+
+class Timeline:
+    """
+    Absolute-time note data for one song.
+
+    notes holds one row per sounded note sorted by onset, events holds the matching note on/off
+    events sorted by time (releases before presses at the same instant, so repeated notes stay visible).
+    note_x and event_x hold the x-location of each row for the key layout at the time the timeline was made
+    """
+    def __init__(self, notes, length, midi_file=None, events=None):
+        self.notes = notes
+        self.length = length
+        self.midi_file = midi_file
+        self.events = build_events(notes) if events is None else events
+        self.note_x = key_x_positions(self.notes['note'])
+        self.event_x = key_x_positions(self.events['note'])
+
+    def __len__(self):
+        return len(self.notes)
+
+    def max_polyphony(self):
+        """
+        Output:
+            Largest number of notes sounding at the same moment
+        """
+        if len(self.events) == 0:
+            return 0
+        return int(np.cumsum(np.where(self.events['on'], 1, -1)).max())
+
+
+def load_timeline(midi_file, use_cache=True):
+    """
+    Given:
+        midi_file: path to a .mid file
+        use_cache: read from and write to the on-disk timeline cache
+    Output:
+        Timeline for the file
+    """
+    if not use_cache:
+        return build_timeline(mido.MidiFile(midi_file), midi_file)
+    with open(midi_file, 'rb') as song_file:
+        contents = song_file.read()
+    key = cache_key(contents)
+    song = read_cached_timeline(key, midi_file)
+    if song is None:
+        song = build_timeline(mido.MidiFile(file=BytesIO(contents)), midi_file)
+        write_cached_timeline(key, song)
+    return song
+
+
+def cached_timeline(midi_file):
+    """
+    Output:
+        Timeline for the file if it is already in the cache, otherwise None (the file is not parsed)
+    """
+    with open(midi_file, 'rb') as song_file:
+        return read_cached_timeline(cache_key(song_file.read()), midi_file)
+
+
+def cache_key(contents):
+    """
+    Hash of the file contents and the parser version
+    """
+    digest = hashlib.sha1()
+    digest.update(str(PARSER_VERSION).encode())
+    digest.update(contents)
+    return digest.hexdigest()
+
+
+def cache_paths(key):
+    base = os.path.join(CACHE_DIRECTORY, key)
+    return base + '.notes.npy', base + '.events.npy', base + '.json'
+
+
+def read_cached_timeline(key, midi_file):
+    """
+    Output:
+        Timeline from the cache with its x-locations computed for the current key layout, or None on a miss
+
+    The note and event arrays are read-only memory maps of the cache files.
+    """
+    notes_path, events_path, info_path = cache_paths(key)
+    try:
+        with open(info_path) as info_file:
+            length = json.load(info_file)['length']
+        notes = np.load(notes_path, mmap_mode='r')
+        events = np.load(events_path, mmap_mode='r')
+    except (KeyError, OSError, TypeError, ValueError):
+        return None
+    if notes.dtype != NOTE_DTYPE or events.dtype != EVENT_DTYPE:
+        return None
+    return Timeline(notes, length, midi_file, events)
+
+
+def write_cached_timeline(key, song):
+    """
+    Stores a timeline; the info file is written last, so a half-written entry is never read
+    """
+    notes_path, events_path, info_path = cache_paths(key)
+    try:
+        os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+        for path, contents in ((notes_path, song.notes), (events_path, song.events)):
+            write_file(path, lambda cache_file: np.save(cache_file, contents))
+        info = {'length': song.length, 'parser_version': PARSER_VERSION, 'midi_file': song.midi_file}
+        write_file(info_path, lambda info_file: json.dump(info, info_file), 'w')
+    except OSError:
+        pass  # A read-only or full disk just means the song is parsed again next time
+
+
+def write_file(path, write, mode='wb'):
+    """
+    Calls write with a temporary file of this process's own next to path, then renames it to path, so neither
+    readers nor other processes caching the same song ever see a half-written file
+    """
+    handle, temporary = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(handle, mode) as temporary_file:
+            write(temporary_file)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def build_timeline(music, midi_file=None):
+    """
+    Collects the note messages of every track with their absolute tick, pairs every note_on with its
+    release in tick order, then converts all onset and offset ticks to seconds at once through the song's
+    tempo map. Notes that are never released end with the song.
+    """
+    tempo_map = tempo.TempoMap(music)
+    note_messages = []  # (tick, message), tracks one after another so the sort below keeps track order on ties
+    end_tick = 0
+    for track in music.tracks:
+        tick = 0
+        for message in track:
+            tick += message.time
+            if message.type == 'note_on' or message.type == 'note_off':
+                note_messages.append((tick, message))
+        end_tick = max(end_tick, tick)
+    note_messages.sort(key=lambda tick_and_message: tick_and_message[0])
+
+    onsets, offsets, pitches, velocities = [], [], [], []
+    held = {}  # (channel, note) -> row indices of notes still sounding, oldest first
+    for tick, message in note_messages:
+        if message.type == 'note_on' and message.velocity > 0:
+            held.setdefault((message.channel, message.note), []).append(len(onsets))
+            onsets.append(tick)
+            offsets.append(-1)
+            pitches.append(message.note)
+            velocities.append(message.velocity)
+        else:
+            sounding = held.get((message.channel, message.note))
+            if sounding:
+                offsets[sounding.pop(0)] = tick
+
+    offsets = np.array(offsets, dtype=np.int64)
+    offsets[offsets < 0] = end_tick
+    notes = np.zeros(len(onsets), dtype=NOTE_DTYPE)
+    notes['onset'] = tempo_map.to_seconds(onsets)
+    notes['offset'] = tempo_map.to_seconds(offsets)
+    notes['note'] = pitches
+    notes['velocity'] = velocities
+    notes = notes[np.argsort(notes['onset'], kind='stable')]
+    return Timeline(notes, float(tempo_map.to_seconds(end_tick)), midi_file)
+
+
+def build_events(notes):
+    """
+    Splits every note into a press event at its onset and a release event at its offset
+    """
+    events = np.zeros(len(notes) * 2, dtype=EVENT_DTYPE)
+    for half, (field, on) in enumerate((('onset', True), ('offset', False))):
+        rows = events[half * len(notes):(half + 1) * len(notes)]
+        rows['time'] = notes[field]
+        rows['on'] = on
+        rows['note'] = notes['note']
+        rows['velocity'] = notes['velocity']
+    return events[np.lexsort((events['on'], events['time']))]
+
+
+def relayout(song):
+    """
+    Timeline sharing the notes and events of song, with its x-locations recomputed for the current key layout
+    (after the window is resized); song itself keeps the old ones, as it may still be in use at the old size
+    """
+    return Timeline(song.notes, song.length, song.midi_file, song.events)
+
+
+def key_x_positions(notes):
+    """
+    Maps an array of MIDI note numbers to display x-locations with a single table lookup
+    """
+    return KeyPress.KeyPress.get_locations_x(notes.astype(np.int32) - LOWEST_PIANO_NOTE)